@@ -0,0 +1,85 @@
+"""initial schema
+
+Baseline of the schema previously created by Base.metadata.create_all.
+Tables that already exist are left untouched, so databases created before
+migrations were introduced can be upgraded in place.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(length=50), nullable=False),
+            sa.Column('hashed_password', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    if not inspector.has_table('permissions'):
+        op.create_table(
+            'permissions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('description', sa.String(length=255), nullable=True),
+        )
+        op.create_index('ix_permissions_id', 'permissions', ['id'])
+        op.create_index('ix_permissions_name', 'permissions', ['name'], unique=True)
+
+    if not inspector.has_table('user_permissions'):
+        op.create_table(
+            'user_permissions',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('permission_id', sa.Integer(), sa.ForeignKey('permissions.id'), primary_key=True),
+        )
+
+    if not inspector.has_table('tasks'):
+        op.create_table(
+            'tasks',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('task_id', sa.String(length=255), nullable=False),
+            sa.Column('group_id', sa.String(length=255), nullable=True),
+            sa.Column('module_name', sa.String(length=50), nullable=False),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('parameters', sa.JSON(), nullable=True),
+            sa.Column('result', sa.JSON(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_tasks_id', 'tasks', ['id'])
+        op.create_index('ix_tasks_task_id', 'tasks', ['task_id'], unique=True)
+        op.create_index('ix_tasks_group_id', 'tasks', ['group_id'])
+    elif 'group_id' not in {column['name'] for column in inspector.get_columns('tasks')}:
+        # Added together with batch submission, before migrations existed
+        op.add_column('tasks', sa.Column('group_id', sa.String(length=255), nullable=True))
+        op.create_index('ix_tasks_group_id', 'tasks', ['group_id'])
+
+
+def downgrade() -> None:
+    op.drop_table('tasks')
+    op.drop_table('user_permissions')
+    op.drop_table('permissions')
+    op.drop_table('users')
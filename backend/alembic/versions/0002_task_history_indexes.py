@@ -0,0 +1,41 @@
+"""task history indexes
+
+Composite indexes backing GET /modules/tasks: every history query filters on
+the owning user and pages by (created_at, id) descending, optionally narrowed
+by module or status. On PostgreSQL they are built concurrently so the tasks
+table stays writable while the indexes are created.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_tasks_user_created': 'user_id, created_at DESC, id DESC',
+    'ix_tasks_user_module_created': 'user_id, module_name, created_at DESC, id DESC',
+    'ix_tasks_user_status_created': 'user_id, status, created_at DESC, id DESC',
+}
+
+
+def upgrade() -> None:
+    concurrently = 'CONCURRENTLY ' if op.get_bind().dialect.name == 'postgresql' else ''
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(f'CREATE INDEX {concurrently}IF NOT EXISTS {name} ON tasks ({columns})')
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,149 @@
+"""partition tasks by month
+
+Rebuilds tasks on PostgreSQL as a table range-partitioned on created_at, with
+one partition per month and a default partition for rows outside all of them.
+Existing rows are copied into the new table, so large tables should be
+migrated in a maintenance window. Later partitions are created, and old ones
+retired, by app.db.partitions.
+
+A primary key or unique index of a partitioned table has to include the
+partition key: the primary key becomes (id, created_at) and task_id is
+indexed without a unique constraint (Celery task ids are UUIDs). SQLite
+databases keep the plain table. On every database ix_tasks_id goes: the
+primary key already indexes id.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions created beyond the current month; the maintenance task keeps
+# TASK_PARTITION_PREMAKE_MONTHS of them from then on
+PREMAKE_MONTHS = 3
+
+COLUMNS = 'id, task_id, group_id, module_name, user_id, status, parameters, result, error, created_at, updated_at'
+
+INDEXES = {
+    'ix_tasks_task_id': 'task_id',
+    'ix_tasks_group_id': 'group_id',
+    'ix_tasks_user_created': 'user_id, created_at DESC, id DESC',
+    'ix_tasks_user_module_created': 'user_id, module_name, created_at DESC, id DESC',
+    'ix_tasks_user_status_created': 'user_id, status, created_at DESC, id DESC',
+}
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    op.execute('DROP INDEX IF EXISTS ix_tasks_id')
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE tasks RENAME TO tasks_unpartitioned')
+    op.execute('ALTER TABLE tasks_unpartitioned RENAME CONSTRAINT tasks_pkey TO tasks_unpartitioned_pkey')
+    for name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    # The id sequence moves to the new table
+    op.execute('ALTER SEQUENCE tasks_id_seq OWNED BY NONE')
+
+    op.execute("""
+        CREATE TABLE tasks (
+            id INTEGER NOT NULL DEFAULT nextval('tasks_id_seq'),
+            task_id VARCHAR(255) NOT NULL,
+            group_id VARCHAR(255),
+            module_name VARCHAR(50) NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            status VARCHAR(20) NOT NULL,
+            parameters JSON,
+            result JSON,
+            error TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            updated_at TIMESTAMP WITHOUT TIME ZONE,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute('ALTER SEQUENCE tasks_id_seq OWNED BY tasks.id')
+    op.execute(
+        "COMMENT ON TABLE tasks IS 'Partitioned by month on created_at (tasks_yYYYYmMM), "
+        "maintained by app.db.partitions'"
+    )
+    op.execute('CREATE TABLE tasks_default PARTITION OF tasks DEFAULT')
+
+    oldest = bind.execute(sa.text('SELECT min(created_at) FROM tasks_unpartitioned')).scalar()
+    current = datetime.utcnow().date().replace(day=1)
+    month = min(oldest.date().replace(day=1), current) if oldest else current
+    while month <= add_months(current, PREMAKE_MONTHS):
+        op.execute(
+            f"CREATE TABLE tasks_y{month.year:04d}m{month.month:02d} PARTITION OF tasks "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        )
+        month = add_months(month, 1)
+
+    # created_at was nullable; it is the partition key now
+    op.execute(f"""
+        INSERT INTO tasks ({COLUMNS})
+        SELECT id, task_id, group_id, module_name, user_id, status, parameters, result, error,
+               COALESCE(created_at, updated_at, now() AT TIME ZONE 'utc'), updated_at
+        FROM tasks_unpartitioned
+    """)
+    op.execute('DROP TABLE tasks_unpartitioned')
+
+    # Indexes of the partitioned table are created on every partition
+    for name, columns in INDEXES.items():
+        op.execute(f'CREATE INDEX {name} ON tasks ({columns})')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.create_index('ix_tasks_id', 'tasks', ['id'])
+        return
+
+    op.execute('ALTER TABLE tasks RENAME TO tasks_partitioned')
+    op.execute('ALTER TABLE tasks_partitioned RENAME CONSTRAINT tasks_pkey TO tasks_partitioned_pkey')
+    for name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('ALTER SEQUENCE tasks_id_seq OWNED BY NONE')
+
+    op.execute("""
+        CREATE TABLE tasks (
+            id INTEGER NOT NULL DEFAULT nextval('tasks_id_seq') PRIMARY KEY,
+            task_id VARCHAR(255) NOT NULL,
+            group_id VARCHAR(255),
+            module_name VARCHAR(50) NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            status VARCHAR(20) NOT NULL,
+            parameters JSON,
+            result JSON,
+            error TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            updated_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """)
+    op.execute('ALTER SEQUENCE tasks_id_seq OWNED BY tasks.id')
+    op.execute(f'INSERT INTO tasks ({COLUMNS}) SELECT {COLUMNS} FROM tasks_partitioned')
+    # Drops the partitions along with it
+    op.execute('DROP TABLE tasks_partitioned')
+
+    op.execute('CREATE INDEX ix_tasks_id ON tasks (id)')
+    op.execute('CREATE UNIQUE INDEX ix_tasks_task_id ON tasks (task_id)')
+    for name, columns in INDEXES.items():
+        if name != 'ix_tasks_task_id':
+            op.execute(f'CREATE INDEX {name} ON tasks ({columns})')
@@ -0,0 +1,34 @@
+"""workflow steps
+
+Tasks that run as a step of a workflow (POST /modules/workflows) record the
+workflow and their step id. Adding nullable columns without a default is a
+catalog-only change; the index is built on every partition of tasks.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('workflow_id', sa.String(length=255), nullable=True))
+    op.add_column('tasks', sa.Column('step_id', sa.String(length=100), nullable=True))
+    op.create_index('ix_tasks_workflow_id', 'tasks', ['workflow_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_workflow_id', table_name='tasks')
+    op.drop_column('tasks', 'step_id')
+    op.drop_column('tasks', 'workflow_id')
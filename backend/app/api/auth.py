@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
-from sqlalchemy.orm import Session
-from app.core.security import verify_password, create_access_token
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.security import verify_password_async, create_access_token, get_token_version
 from app.core.config import settings
 from app.models.user import get_user
 from app.schemas.schemas import Token, UserInfo
 from app.api.dependencies import get_current_user
 from app.db.database import get_db
+from app.db import models
 
 router = APIRouter()
 
@@ -15,23 +17,46 @@ router = APIRouter()
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     User login endpoint
     Returns JWT token for authentication
     """
-    user = get_user(db, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await get_user(db, form_data.username)
+    valid, new_hash = False, None
+    if user:
+        # bcrypt runs in a worker pool, the event loop keeps serving requests
+        valid, new_hash = await verify_password_async(
+            user.username, form_data.password, user.hashed_password
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        # Hashing parameters changed since this password was stored
+        await db.execute(
+            update(models.User).where(models.User.id == user.id).values(hashed_password=new_hash)
+        )
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Everything get_current_user needs is signed into the token, so
+    # authenticated requests do not have to reload the user
+    token_version = 0
+    if settings.AUTH_TOKEN_VERSION_CHECK:
+        token_version = await get_token_version(user.username, use_cache=False)
     access_token = create_access_token(
-        data={"sub": user.username, "permissions": user.permissions},
+        data={
+            "sub": user.username,
+            "uid": user.id,
+            "permissions": user.permissions,
+            "ver": token_version
+        },
         expires_delta=access_token_expires
     )
     
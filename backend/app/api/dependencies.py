@@ -1,16 +1,32 @@
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.security import oauth2_scheme, decode_access_token
-from app.models.user import get_user, User
-from app.db.database import get_db
-from typing import List
-
-
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
+from fastapi import Depends, HTTPException, Query, status
+from app.core.config import settings
+from app.core.metrics import timed
+from app.core.permissions import cache_user, get_cached_user
+from app.core.security import oauth2_scheme, decode_access_token, get_token_version
+from app.models.user import get_user, get_user_from_claims, User
+from app.db.database import AsyncReadSessionLocal
+from typing import List, Optional
+
+
+async def load_user(username: str) -> Optional[User]:
+    """Load a user and their permissions, from the permission cache if possible"""
+    user = get_cached_user(username)
+    if user is not None:
+        return user
+    async with AsyncReadSessionLocal() as db:
+        user = await get_user(db, username)
+    if user is not None:
+        cache_user(user)
+    return user
+
+
+async def authenticate_token(token: str) -> User:
+    """
+    Resolve a bearer token to the user it was issued for
+
+    With AUTH_STATELESS the signed claims are trusted as-is and no database
+    query is made; the only external check is the (cached) token version.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,17 +41,37 @@ async def get_current_user(
     if username is None:
         raise credentials_exception
     
-    user = get_user(db, username)
+    user = get_user_from_claims(payload) if settings.AUTH_STATELESS else None
+    if user is None:
+        user = await load_user(username)
     if user is None:
         raise credentials_exception
     
+    if settings.AUTH_TOKEN_VERSION_CHECK:
+        if payload.get("ver", 0) != await get_token_version(username):
+            raise credentials_exception
+    
     return user
 
 
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    """Get current authenticated user"""
+    with timed("get_current_user"):
+        return await authenticate_token(token)
+
+
+async def get_current_user_from_query(token: str = Query(...)) -> User:
+    """
+    Get current authenticated user from a `token` query parameter
+    Used by streaming endpoints, since EventSource cannot send an Authorization header
+    """
+    return await authenticate_token(token)
+
+
 def require_permission(required_permission: str):
     """Dependency to check if user has required permission"""
     async def permission_checker(current_user: User = Depends(get_current_user)) -> User:
-        if required_permission not in current_user.permissions:
+        if required_permission not in current_user.permission_set:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Permission denied. Required permission: {required_permission}"
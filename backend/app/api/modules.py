@@ -1,10 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import base64
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from celery import chain, group
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from app.schemas.schemas import TaskCreate, TaskStatus
-from app.api.dependencies import get_current_user, require_permission
-from app.core.tasks import execute_medical_script
-from app.db.database import get_db
+from pydantic import ValidationError
+from app.schemas.schemas import (
+    TaskCreate, TaskStatus, TaskPage, PartialResults, BatchTaskCreate, BatchTaskResponse, BatchStatus,
+    WorkflowCreate, WorkflowResponse, WorkflowStatus, WorkflowStep
+)
+from app.api.dependencies import get_current_user, get_current_user_from_query
+from app.core import admission
+from app.core.config import settings
+from app.core.blobstore import get_blob_store, get_result_ref
+from app.core.events import TaskEventSubscription, TERMINAL_STATUSES, build_task_event, publish_task_event, read_partial_results
+from app.core.metrics import timed
+from app.core.permissions import get_module_catalog
+from app.core.result_cache import async_release_inflight, claim_inflight, get_cache_stats, result_cache_key
+from app.core.tasks import cancel_task, execute_medical_script, execute_workflow_step
+from app.core.workflows import level_carries, step_spec, workflow_levels, workflow_status
+from app.scripts.registry import ModuleSpec, get_module
+from app.db.database import AsyncSessionLocal, get_db, get_read_db
 from app.db import models
 from celery.result import AsyncResult
 from app.core.celery_app import celery_app
@@ -12,8 +36,18 @@ from app.core.celery_app import celery_app
 router = APIRouter()
 
 
-def record_task_in_db(
-    db: Session,
+async def admit_submission(user_id: int, tasks: Dict[str, str]) -> None:
+    """Apply admission control to a submission (task id -> module name), refused with 429"""
+    try:
+        await admission.admit(user_id, tasks)
+    except admission.AdmissionDenied as e:
+        if e.retry_after is None:
+            raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def record_task_in_db(
+    db: AsyncSession,
     task_id: str,
     module_name: str,
     user_id: int,
@@ -29,51 +63,158 @@ def record_task_in_db(
     )
     db.add(db_task)
     try:
-        db.commit()
-        db.refresh(db_task)
+        with timed("record_task_in_db"):
+            await db.commit()
         return db_task
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         # If task_id already exists, update existing record
-        db_task = db.query(models.Task).filter(models.Task.task_id == task_id).first()
+        result = await db.execute(select(models.Task).where(models.Task.task_id == task_id))
+        db_task = result.scalars().first()
         if db_task:
             db_task.status = "pending"
             db_task.parameters = parameters
-            db.commit()
-            db.refresh(db_task)
+            await db.commit()
         return db_task
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to record task in database: {str(e)}"
         )
 
 
-@router.post("/module1/execute", response_model=dict)
-async def execute_module1(
+async def submit_task(
+    db: AsyncSession,
+    spec: ModuleSpec,
+    user_id: int,
+    parameters: dict,
+    priority: Optional[int] = None
+) -> Tuple[str, bool]:
+    """
+    Record a task in the database, then submit it to Celery
+    The row is written first so status updates from the worker always find it.
+    Publishing blocks on the broker, so it runs in the threadpool.
+    
+    Returns the task ID and whether a new task was created; an identical
+    execution that is already running is returned instead of starting another,
+    without going through admission control.
+    Raises HTTPException 429 if admission control refuses the task.
+    """
+    module_name = spec.module_id
+    task_id = str(uuid.uuid4())
+    cache_key = None
+    if settings.RESULT_CACHE_ENABLED:
+        cache_key = result_cache_key(module_name, parameters)
+        running_task_id = await claim_inflight(cache_key, task_id, user_id)
+        if running_task_id is not None:
+            return running_task_id, False
+    try:
+        await admit_submission(user_id, {task_id: module_name})
+    except HTTPException:
+        if cache_key:
+            await async_release_inflight(task_id)
+        raise
+    
+    db_task = None
+    try:
+        db_task = await record_task_in_db(db, task_id, module_name, user_id, parameters)
+        with timed("apply_async"):
+            await run_in_threadpool(
+                execute_medical_script.apply_async,
+                args=[module_name, parameters],
+                task_id=task_id,
+                priority=priority,
+                soft_time_limit=spec.soft_time_limit,
+                time_limit=spec.time_limit
+            )
+    except Exception as e:
+        # Identical submissions must not attach to a task that never runs
+        if cache_key:
+            await async_release_inflight(task_id)
+        await admission.async_release([task_id])
+        if db_task is not None:
+            db_task.status = "failed"
+            db_task.error = f"Failed to submit task: {str(e)}"
+            await db.commit()
+        raise
+    return task_id, True
+
+
+def submission_response(task_id: str, created: bool) -> dict:
+    """Response body of the execute endpoints"""
+    return {
+        "task_id": task_id,
+        "status": "pending",
+        "message": "Task submitted successfully" if created else "Attached to identical running task"
+    }
+
+
+def resolve_module(module_id: str, current_user) -> ModuleSpec:
+    """Look up an executable module and check the user may run it"""
+    spec = get_module(module_id)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown module: {module_id}")
+    if spec.permission not in current_user.permission_set:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied. Required permission: {spec.permission}"
+        )
+    return spec
+
+
+def resolve_modules(module_ids: Set[str], current_user) -> Dict[str, ModuleSpec]:
+    """Look up the modules of a multi-task submission and check all permissions at once"""
+    unknown_modules = sorted(m for m in module_ids if get_module(m) is None)
+    if unknown_modules:
+        raise HTTPException(status_code=400, detail=f"Unknown modules: {', '.join(unknown_modules)}")
+    specs = {m: get_module(m) for m in module_ids}
+    missing_permissions = sorted(
+        {spec.permission for spec in specs.values()} - current_user.permission_set
+    )
+    if missing_permissions:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied. Required permissions: {', '.join(missing_permissions)}"
+        )
+    return specs
+
+
+def validate_module_parameters(spec: ModuleSpec, parameters: dict, loc: tuple) -> dict:
+    """Validate parameters against the module schema, reported like request body errors"""
+    try:
+        return spec.validate_parameters(parameters)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": loc + tuple(error["loc"])} for error in e.errors(include_url=False)
+        ])
+
+
+@router.post("/{module_id}/execute", response_model=dict)
+async def execute_module(
+    module_id: str,
     task_data: TaskCreate,
-    current_user = Depends(require_permission("module1")),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Execute Module 1: Patient Data Analysis
-    Requires 'module1' permission
+    Execute a registered module
+    Requires the module's permission; parameters are validated against its schema
     """
+    if task_data.module_name is not None and task_data.module_name != module_id:
+        raise RequestValidationError([{
+            "type": "value_error",
+            "loc": ("body", "module_name"),
+            "msg": f"module_name does not match the module in the path: {module_id}",
+            "input": task_data.module_name
+        }])
+    spec = resolve_module(module_id, current_user)
+    parameters = validate_module_parameters(spec, task_data.parameters, ("body", "parameters"))
     try:
-        # Submit task to Celery
-        task = execute_medical_script.apply_async(
-            args=["module1", task_data.parameters]
-        )
-        
-        # Record task in database
-        record_task_in_db(db, task.id, "module1", current_user.id, task_data.parameters)
-        
-        return {
-            "task_id": task.id,
-            "status": "pending",
-            "message": "Task submitted successfully"
-        }
+        task_id, created = await submit_task(db, spec, current_user.id, parameters, task_data.priority)
+        return submission_response(task_id, created)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -81,136 +222,630 @@ async def execute_module1(
         )
 
 
-@router.post("/module2/execute", response_model=dict)
-async def execute_module2(
-    task_data: TaskCreate,
-    current_user = Depends(require_permission("module2")),
-    db: Session = Depends(get_db)
+@router.post("/batch", response_model=BatchTaskResponse)
+async def execute_batch(
+    batch: BatchTaskCreate,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Execute Module 2: Medical Image Processing
-    Requires 'module2' permission
+    Execute many module tasks in one request
+    Permissions are checked once for the whole batch, all task rows are
+    written with one bulk insert and all tasks are published as one Celery group
     """
+    if not batch.tasks:
+        raise HTTPException(status_code=400, detail="Batch contains no tasks")
+    if len(batch.tasks) > settings.BATCH_MAX_TASKS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large. Maximum tasks per batch: {settings.BATCH_MAX_TASKS}"
+        )
+    
+    specs = resolve_modules({item.module_name for item in batch.tasks}, current_user)
+    
+    parameters = [
+        validate_module_parameters(specs[item.module_name], item.parameters, ("body", "tasks", index, "parameters"))
+        for index, item in enumerate(batch.tasks)
+    ]
+    
+    group_id = str(uuid.uuid4())
+    task_ids = [str(uuid.uuid4()) for _ in batch.tasks]
+    await admit_submission(current_user.id, {
+        task_id: item.module_name for task_id, item in zip(task_ids, batch.tasks)
+    })
+    
+    # Record all tasks before publishing, like submit_task
     try:
-        # Submit task to Celery
-        task = execute_medical_script.apply_async(
-            args=["module2", task_data.parameters]
+        await db.execute(insert(models.Task), [
+            {
+                "task_id": task_id,
+                "group_id": group_id,
+                "module_name": item.module_name,
+                "user_id": current_user.id,
+                "status": "pending",
+                "parameters": item_parameters
+            }
+            for task_id, item, item_parameters in zip(task_ids, batch.tasks, parameters)
+        ])
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        await admission.async_release(task_ids)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to record tasks in database: {str(e)}"
+        )
+    
+    job = group(
+        execute_medical_script.signature(
+            args=[item.module_name, item_parameters],
+            task_id=task_id,
+            priority=item.priority,
+            soft_time_limit=specs[item.module_name].soft_time_limit,
+            time_limit=specs[item.module_name].time_limit
         )
-        
-        # Record task in database
-        record_task_in_db(db, task.id, "module2", current_user.id, task_data.parameters)
-        
-        return {
-            "task_id": task.id,
-            "status": "pending",
-            "message": "Task submitted successfully"
-        }
+        for task_id, item, item_parameters in zip(task_ids, batch.tasks, parameters)
+    )
+    try:
+        with timed("apply_async_group"):
+            await run_in_threadpool(job.apply_async, task_id=group_id)
     except Exception as e:
+        await db.execute(
+            update(models.Task)
+            .where(models.Task.group_id == group_id)
+            .values(status="failed", error=f"Failed to submit task: {str(e)}")
+        )
+        await db.commit()
+        await admission.async_release(task_ids)
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to execute task: {str(e)}"
+            detail=f"Failed to execute batch: {str(e)}"
         )
+    
+    return {
+        "group_id": group_id,
+        "task_ids": task_ids,
+        "status": "pending",
+        "message": f"{len(task_ids)} tasks submitted successfully"
+    }
 
 
-@router.post("/module3/execute", response_model=dict)
-async def execute_module3(
-    task_data: TaskCreate,
-    current_user = Depends(require_permission("module3")),
-    db: Session = Depends(get_db)
+def build_workflow_canvas(
+    workflow_id: str,
+    steps: List[WorkflowStep],
+    parameters: Dict[str, dict],
+    task_ids: Dict[str, str],
+    specs: Dict[str, ModuleSpec]
 ):
     """
-    Execute Module 3: Drug Interaction Analysis
-    Requires 'module3' permission
+    One group of step tasks per dependency level, chained; Celery runs each
+    level as the body of a chord over the previous one
+    """
+    by_id = {step.step_id: step for step in steps}
+    levels = workflow_levels(steps)
+    # Lists, not generators: group() keeps a generator and would only
+    # evaluate it once the loop variables have moved on
+    return chain(*[
+        group([
+            execute_workflow_step.signature(
+                kwargs={
+                    "workflow_id": workflow_id,
+                    "step": step_spec(by_id[step_id], parameters[step_id]),
+                    "carry": carry,
+                },
+                task_id=task_ids[step_id],
+                priority=by_id[step_id].priority,
+                soft_time_limit=specs[by_id[step_id].module_name].soft_time_limit,
+                time_limit=specs[by_id[step_id].module_name].time_limit
+            )
+            for step_id in level
+        ])
+        for level, carry in zip(levels, level_carries(steps, levels))
+    ])
+
+
+@router.post("/workflows", response_model=WorkflowResponse)
+async def execute_workflow(
+    workflow: WorkflowCreate,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """
+    Execute a DAG of module steps
+    The workers run the steps level by level and hand results on to later
+    steps themselves; the client only follows the workflow's progress
+    """
+    if not workflow.steps:
+        raise HTTPException(status_code=400, detail="Workflow contains no steps")
+    if len(workflow.steps) > settings.WORKFLOW_MAX_STEPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Workflow too large. Maximum steps per workflow: {settings.WORKFLOW_MAX_STEPS}"
+        )
+    try:
+        workflow_levels(workflow.steps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    specs = resolve_modules({step.module_name for step in workflow.steps}, current_user)
+    # Inputs from earlier steps are merged in and validated again by the worker
+    parameters = {
+        step.step_id: validate_module_parameters(specs[step.module_name], step.parameters, ("body", "steps", index, "parameters"))
+        for index, step in enumerate(workflow.steps)
+    }
+    
+    workflow_id = str(uuid.uuid4())
+    task_ids = {step.step_id: str(uuid.uuid4()) for step in workflow.steps}
+    # Every step holds its slots from submission, like the tasks of a batch
+    await admit_submission(current_user.id, {
+        task_ids[step.step_id]: step.module_name for step in workflow.steps
+    })
+    
+    # Record all steps before publishing, like submit_task
     try:
-        # Submit task to Celery
-        task = execute_medical_script.apply_async(
-            args=["module3", task_data.parameters]
+        await db.execute(insert(models.Task), [
+            {
+                "task_id": task_ids[step.step_id],
+                "workflow_id": workflow_id,
+                "step_id": step.step_id,
+                "module_name": step.module_name,
+                "user_id": current_user.id,
+                "status": "pending",
+                "parameters": parameters[step.step_id]
+            }
+            for step in workflow.steps
+        ])
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        await admission.async_release(list(task_ids.values()))
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to record workflow in database: {str(e)}"
         )
-        
-        # Record task in database
-        record_task_in_db(db, task.id, "module3", current_user.id, task_data.parameters)
-        
-        return {
-            "task_id": task.id,
-            "status": "pending",
-            "message": "Task submitted successfully"
-        }
+    
+    canvas = build_workflow_canvas(workflow_id, workflow.steps, parameters, task_ids, specs)
+    try:
+        with timed("apply_async_workflow"):
+            await run_in_threadpool(canvas.apply_async)
     except Exception as e:
+        await db.execute(
+            update(models.Task)
+            .where(models.Task.workflow_id == workflow_id)
+            .values(status="failed", error=f"Failed to submit task: {str(e)}")
+        )
+        await db.commit()
+        await admission.async_release(list(task_ids.values()))
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to execute task: {str(e)}"
+            detail=f"Failed to execute workflow: {str(e)}"
         )
+    
+    return {
+        "workflow_id": workflow_id,
+        "task_ids": task_ids,
+        "status": "pending",
+        "message": f"Workflow with {len(task_ids)} steps submitted successfully"
+    }
+
+
+@router.get("/workflows/{workflow_id}", response_model=WorkflowStatus, response_model_exclude_none=True)
+async def get_workflow_status(
+    workflow_id: str,
+    include_results: bool = False,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get overall and per-step progress of a workflow
+    Running steps report their progress counts; step results are only
+    loaded when requested
+    """
+    columns = [
+        models.Task.task_id,
+        models.Task.step_id,
+        models.Task.module_name,
+        models.Task.status,
+        models.Task.error,
+    ]
+    if include_results:
+        columns.append(models.Task.result)
+    result = await db.execute(
+        select(*columns)
+        .where(models.Task.workflow_id == workflow_id, models.Task.user_id == current_user.id)
+        .order_by(models.Task.id)
+    )
+    steps = [dict(row) for row in result.mappings().all()]
+    if not steps:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    for step in steps:
+        if step["status"] not in TERMINAL_STATUSES and step["status"] != "pending":
+            step["progress"] = (await run_in_threadpool(read_task_result, step["task_id"])).get("progress")
+    
+    statuses = [step["status"] for step in steps]
+    completed = sum(1 for status in statuses if status in TERMINAL_STATUSES)
+    return {
+        "workflow_id": workflow_id,
+        "status": workflow_status(statuses),
+        "total": len(steps),
+        "completed": completed,
+        "progress": round(completed / len(steps), 4),
+        "steps": steps
+    }
+
+
+@router.get("/batch/{group_id}", response_model=BatchStatus)
+async def get_batch_status(
+    group_id: str,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get aggregate progress of a batch
+    Counts the batch's tasks per status with a single grouped query
+    """
+    result = await db.execute(
+        select(models.Task.status, func.count(models.Task.id))
+        .where(models.Task.group_id == group_id, models.Task.user_id == current_user.id)
+        .group_by(models.Task.status)
+    )
+    rows = result.all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    counts = {task_status: count for task_status, count in rows}
+    total = sum(counts.values())
+    completed = sum(count for task_status, count in counts.items() if task_status in TERMINAL_STATUSES)
+    return {
+        "group_id": group_id,
+        "total": total,
+        "completed": completed,
+        "progress": round(completed / total, 4),
+        "counts": counts
+    }
+
+
+def build_task_status(task_id: str, task_result: AsyncResult) -> dict:
+    """Translate a Celery result into the TaskStatus response shape"""
+    if task_result.state == 'PENDING':
+        return build_task_event(task_id, "pending")
+    if task_result.state == 'FAILURE':
+        return build_task_event(task_id, "failed", error=str(task_result.info))
+    if task_result.state == 'SUCCESS':
+        return build_task_event(task_id, "success", result=task_result.result)
+    if task_result.state == 'PROGRESS':
+        return build_task_event(task_id, "progress", progress=task_result.info)
+    if task_result.state == 'REVOKED':
+        return build_task_event(task_id, "cancelled", error="Cancelled")
+    return build_task_event(
+        task_id,
+        task_result.state.lower(),
+        result=task_result.info if hasattr(task_result, 'info') else None
+    )
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque keyset cursor pointing after the given row"""
+    raw = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/tasks", response_model=TaskPage, response_model_exclude_none=True)
+async def list_tasks(
+    module_name: Optional[str] = None,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    include_parameters: bool = False,
+    include_result: bool = False,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    List the current user's task history, newest first
+    Uses keyset pagination: pass `next_cursor` from a page as `cursor` to get
+    the next one. Parameters and result JSON are only loaded when requested.
+    """
+    columns = [
+        models.Task.id,
+        models.Task.task_id,
+        models.Task.module_name,
+        models.Task.status,
+        models.Task.group_id,
+        models.Task.workflow_id,
+        models.Task.step_id,
+        models.Task.error,
+        models.Task.created_at,
+        models.Task.updated_at,
+    ]
+    if include_parameters:
+        columns.append(models.Task.parameters)
+    if include_result:
+        columns.append(models.Task.result)
+    
+    query = select(*columns).where(models.Task.user_id == current_user.id)
+    if module_name is not None:
+        query = query.where(models.Task.module_name == module_name)
+    if status is not None:
+        query = query.where(models.Task.status == status)
+    if created_after is not None:
+        query = query.where(models.Task.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(models.Task.created_at < created_before)
+    if cursor is not None:
+        query = query.where(tuple_(models.Task.created_at, models.Task.id) < decode_cursor(cursor))
+    
+    # One extra row tells whether there is a next page
+    query = query.order_by(models.Task.created_at.desc(), models.Task.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).mappings().all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return {"items": [dict(row) for row in rows], "next_cursor": next_cursor}
+
+
+def read_task_result(task_id: str) -> dict:
+    """Read a task's state from the result backend (blocking)"""
+    return build_task_status(task_id, AsyncResult(task_id, app=celery_app))
+
+
+async def current_task_status(task_id: str, db_task: Optional[models.Task]) -> dict:
+    """
+    Current status of a task, given its row if there is one
+    Workers persist every state transition, so a finished task is answered
+    from its row alone; this also covers tasks cancelled before reaching a
+    worker and results expired from the backend
+    """
+    if db_task is not None and db_task.status in TERMINAL_STATUSES:
+        return build_task_event(task_id, db_task.status, db_task.result, db_task.error)
+    
+    # Unknown or still running: the result backend may be ahead of the row
+    response = await run_in_threadpool(read_task_result, task_id)
+    if db_task is not None and response["status"] == "pending":
+        response["status"] = db_task.status
+    return response
 
 
 @router.get("/tasks/{task_id}", response_model=TaskStatus)
 async def get_task_status(
     task_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get status of a task by task ID
     Returns task status and result if completed
     """
-    task_result = AsyncResult(task_id, app=celery_app)
+    result = await db.execute(select(models.Task).where(models.Task.task_id == task_id))
+    db_task = result.scalars().first()
+    if db_task is not None and db_task.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return await current_task_status(task_id, db_task)
+
+
+@router.delete("/tasks/{task_id}", response_model=dict)
+async def cancel_task_execution(
+    task_id: str,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Cancel a task
+    A queued task is discarded and a running one is terminated, freeing its
+    worker process; the task's status becomes "cancelled"
+    """
+    result = await db.execute(
+        select(models.Task).where(models.Task.task_id == task_id, models.Task.user_id == current_user.id)
+    )
+    db_task = result.scalars().first()
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if db_task.status in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Task already finished with status {db_task.status}")
     
-    # Get task from database
-    db_task = db.query(models.Task).filter(models.Task.task_id == task_id).first()
+    try:
+        await run_in_threadpool(cancel_task, task_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Failed to revoke task: {str(e)}")
     
-    if task_result.state == 'PENDING':
-        response = {
-            "task_id": task_id,
-            "status": "pending",
-            "result": None,
-            "error": None
-        }
-    elif task_result.state == 'FAILURE':
-        response = {
-            "task_id": task_id,
-            "status": "failed",
-            "result": None,
-            "error": str(task_result.info)
-        }
-        # Update database
-        if db_task:
-            try:
-                db_task.status = "failed"
-                db_task.error = str(task_result.info)
-                db.commit()
-            except Exception:
-                db.rollback()
-    elif task_result.state == 'SUCCESS':
-        response = {
-            "task_id": task_id,
-            "status": "success",
-            "result": task_result.result,
-            "error": None
-        }
-        # Update database
-        if db_task:
-            try:
-                db_task.status = "success"
-                db_task.result = task_result.result
-                db.commit()
-            except Exception:
-                db.rollback()
-    else:
-        response = {
-            "task_id": task_id,
-            "status": task_result.state.lower(),
-            "result": task_result.info if hasattr(task_result, 'info') else None,
-            "error": None
-        }
-        # Update database
-        if db_task:
-            try:
-                db_task.status = task_result.state.lower()
-                db.commit()
-            except Exception:
-                db.rollback()
+    # Conditional on the status, so a task that finished meanwhile keeps its outcome
+    updated = await db.execute(
+        update(models.Task)
+        .where(models.Task.task_id == task_id, models.Task.status.notin_(TERMINAL_STATUSES))
+        .values(status="cancelled", error="Cancelled", updated_at=datetime.utcnow())
+    )
+    await db.commit()
+    if updated.rowcount == 0:
+        await db.refresh(db_task)
+        raise HTTPException(status_code=409, detail=f"Task already finished with status {db_task.status}")
     
-    return response
+    if settings.RESULT_CACHE_ENABLED:
+        await async_release_inflight(task_id)
+    # The worker releases them too once the revoke reaches it, if it ever does
+    await admission.async_release([task_id])
+    await run_in_threadpool(publish_task_event, task_id, "cancelled", error="Cancelled")
+    return {"task_id": task_id, "status": "cancelled", "message": "Task cancelled"}
+
+
+@router.get("/tasks/{task_id}/partials", response_model=PartialResults)
+async def get_task_partial_results(
+    task_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get partial results streamed by a chunked script
+    Available while the task runs and for PARTIAL_RESULTS_TTL_SECONDS after
+    """
+    owned = await db.execute(
+        select(models.Task.id).where(models.Task.task_id == task_id, models.Task.user_id == current_user.id)
+    )
+    if owned.first() is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    items = await read_partial_results(task_id, offset, limit)
+    return {
+        "task_id": task_id,
+        "offset": offset,
+        "items": items,
+        "next_offset": offset + len(items)
+    }
+
+
+def parse_range(range_header: str, size: int) -> Tuple[int, int]:
+    """Parse a single-range `Range: bytes=...` header into inclusive offsets"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError("Only single byte ranges are supported")
+    first, _, last = spec.strip().partition("-")
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length <= 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+@router.get("/tasks/{task_id}/result")
+async def download_task_result(
+    task_id: str,
+    request: Request,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Download the result of a finished task
+    Offloaded results are streamed from the blob store in their stored
+    (compressed) encoding, with HTTP range support for resumable downloads
+    """
+    result = await db.execute(
+        select(models.Task.result).where(models.Task.task_id == task_id, models.Task.user_id == current_user.id)
+    )
+    task_result = result.scalar_one_or_none()
+    if task_result is None:
+        raise HTTPException(status_code=404, detail="Result not available")
+    
+    result_ref = get_result_ref(task_result)
+    if result_ref is None:
+        return JSONResponse(task_result)
+    
+    store = get_blob_store()
+    key = result_ref["key"]
+    size = await run_in_threadpool(store.size, key)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Result blob missing")
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Encoding": result_ref["content_encoding"],
+        "ETag": f'"{key.rsplit("/", 1)[-1]}"',
+    }
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            start, end = parse_range(range_header, size)
+        except ValueError:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{size}"}
+            )
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        store.iter_range(key, start, end),
+        status_code=status_code,
+        media_type=result_ref["content_type"],
+        headers=headers
+    )
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/tasks/{task_id}/stream")
+async def stream_task_status(
+    task_id: str,
+    request: Request,
+    current_user = Depends(get_current_user_from_query)
+):
+    """
+    Stream status changes of a task as Server-Sent Events
+    Sends the current status first, then every state transition published by
+    the worker until the task finishes. Authenticate with ?token=<jwt>.
+    """
+    # Checked on the primary: the stream is usually opened right after submitting
+    async def load_task() -> Optional[models.Task]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.Task).where(models.Task.task_id == task_id, models.Task.user_id == current_user.id)
+            )
+            return result.scalars().first()
+    
+    if await load_task() is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    async def event_stream():
+        async with TaskEventSubscription(task_id) as subscription:
+            # Subscribed before reading the snapshot, so no transition is lost;
+            # built like GET /tasks/{task_id}, a finished row being authoritative
+            snapshot = await current_task_status(task_id, await load_task())
+            yield format_sse("status", snapshot)
+            if snapshot["status"] in TERMINAL_STATUSES:
+                return
+            
+            deadline = time.monotonic() + settings.TASK_STREAM_TIMEOUT_SECONDS
+            while time.monotonic() < deadline:
+                if await request.is_disconnected():
+                    return
+                event = await subscription.next_event(settings.TASK_STREAM_HEARTBEAT_SECONDS)
+                if event is None:
+                    # Keep proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse("status", event)
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+            yield format_sse("timeout", {"task_id": task_id})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/cache/stats")
+async def get_result_cache_stats(current_user = Depends(get_current_user)):
+    """
+    Result cache hit and miss counters
+    """
+    return await get_cache_stats()
 
 
 @router.get("/list")
@@ -218,27 +853,5 @@ async def list_modules(current_user = Depends(get_current_user)):
     """
     List available modules based on user permissions
     """
-    modules = []
-    
-    if "module1" in current_user.permissions:
-        modules.append({
-            "id": "module1",
-            "name": "Patient Data Analysis",
-            "description": "Analyze patient data and generate reports"
-        })
-    
-    if "module2" in current_user.permissions:
-        modules.append({
-            "id": "module2",
-            "name": "Medical Image Processing",
-            "description": "Process and analyze medical images"
-        })
-    
-    if "module3" in current_user.permissions:
-        modules.append({
-            "id": "module3",
-            "name": "Drug Interaction Analysis",
-            "description": "Analyze drug interactions and provide recommendations"
-        })
-    
-    return {"modules": modules}
+    catalog = await get_module_catalog()
+    return {"modules": catalog.for_permissions(current_user.permission_set)}
@@ -0,0 +1,211 @@
+"""
+Admission control of task submissions
+Token-bucket rate limits and caps on unfinished tasks, per user and per
+module (applied to each user's tasks of that module), checked atomically in
+Redis when tasks are submitted. A task holds a slot of each capped scope from
+its admission until a worker finishes it, or it is cancelled or expires.
+Limits of 0 are disabled; with no limit configured nothing touches Redis.
+"""
+import json
+import logging
+import math
+import time
+from typing import Dict, List, Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+BUCKET_PREFIX = "admission:bucket:"
+# Sorted set of the task ids holding a slot of a scope, scored by admission time
+SLOTS_PREFIX = "admission:slots:"
+# Slot sets a task was admitted to, so workers release it knowing only its id
+TASK_PREFIX = "admission:task:"
+
+# KEYS: bucket and slot set of each scope. ARGV: now, slot TTL, TASK_PREFIX,
+# then per scope rate (tokens/s), burst, cap, number of task ids and the task
+# ids. Takes tokens and slots of every scope, or of none, and records the
+# slot sets of each task along with its slots: returns {1} on admission,
+# otherwise {0, scope index, "rate" or "concurrency", seconds until enough
+# tokens are back}.
+_ADMIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local task_prefix = ARGV[3]
+local scopes = {}
+local i = 4
+for s = 1, #KEYS / 2 do
+    local scope = {bucket = KEYS[2 * s - 1], slots = KEYS[2 * s], rate = tonumber(ARGV[i]),
+                   burst = tonumber(ARGV[i + 1]), cap = tonumber(ARGV[i + 2]), ids = {}}
+    for j = 1, tonumber(ARGV[i + 3]) do
+        scope.ids[j] = ARGV[i + 3 + j]
+    end
+    i = i + 4 + #scope.ids
+    scopes[s] = scope
+end
+
+for s, scope in ipairs(scopes) do
+    local cost = #scope.ids
+    if scope.rate > 0 then
+        local state = redis.call('HMGET', scope.bucket, 'tokens', 'updated')
+        local tokens = tonumber(state[1]) or scope.burst
+        local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+        scope.tokens = math.min(scope.burst, tokens + elapsed * scope.rate)
+        if scope.tokens < cost then
+            return {0, s, 'rate', tostring((cost - scope.tokens) / scope.rate)}
+        end
+    end
+    if scope.cap > 0 then
+        redis.call('ZREMRANGEBYSCORE', scope.slots, '-inf', now - ttl)
+        if redis.call('ZCARD', scope.slots) + cost > scope.cap then
+            return {0, s, 'concurrency', '0'}
+        end
+    end
+end
+
+local slots = {}
+local order = {}
+for _, scope in ipairs(scopes) do
+    if scope.rate > 0 then
+        redis.call('HSET', scope.bucket, 'tokens', tostring(scope.tokens - #scope.ids), 'updated', tostring(now))
+        -- A bucket left alone until full is the same as no bucket
+        redis.call('EXPIRE', scope.bucket, math.ceil(scope.burst / scope.rate) + 1)
+    end
+    if scope.cap > 0 then
+        for _, id in ipairs(scope.ids) do
+            redis.call('ZADD', scope.slots, now, id)
+            if not slots[id] then
+                slots[id] = {}
+                order[#order + 1] = id
+            end
+            table.insert(slots[id], scope.slots)
+        end
+        redis.call('EXPIRE', scope.slots, ttl)
+    end
+end
+for _, id in ipairs(order) do
+    redis.call('SET', task_prefix .. id, cjson.encode(slots[id]), 'EX', ttl)
+end
+return {1}
+"""
+
+
+class AdmissionDenied(Exception):
+    """A submission exceeds a rate limit or concurrency cap"""
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        # None when the submission exceeds the limit itself and can never pass
+        self.retry_after = retry_after
+
+
+class Scope:
+    """Limits of one user, or of one user's tasks of one module"""
+    def __init__(self, name: str, key: str, rate_per_minute: int, burst: int, cap: int):
+        self.name = name
+        self.key = key
+        self.rate = rate_per_minute / 60.0
+        self.burst = (burst or rate_per_minute) if rate_per_minute else 0
+        self.cap = cap
+        self.task_ids: List[str] = []
+
+
+def holds_slots() -> bool:
+    """Whether admitted tasks hold slots that have to be released"""
+    return bool(settings.USER_MAX_CONCURRENT_TASKS or any(settings.MODULE_MAX_CONCURRENT_TASKS.values()))
+
+
+def build_scopes(user_id: int, tasks: Dict[str, str]) -> List[Scope]:
+    """Limited scopes of a submission of `tasks` (task id -> module name)"""
+    scopes = []
+    if settings.USER_RATE_LIMIT_PER_MINUTE or settings.USER_MAX_CONCURRENT_TASKS:
+        scope = Scope(
+            f"user {user_id}", f"user:{user_id}",
+            settings.USER_RATE_LIMIT_PER_MINUTE, settings.USER_RATE_LIMIT_BURST,
+            settings.USER_MAX_CONCURRENT_TASKS
+        )
+        scope.task_ids = list(tasks)
+        scopes.append(scope)
+    for module_name in sorted(set(tasks.values())):
+        rate = settings.MODULE_RATE_LIMIT_PER_MINUTE.get(module_name, 0)
+        cap = settings.MODULE_MAX_CONCURRENT_TASKS.get(module_name, 0)
+        if rate or cap:
+            scope = Scope(f"user {user_id} on {module_name}", f"user:{user_id}:module:{module_name}", rate, 0, cap)
+            scope.task_ids = [task_id for task_id, name in tasks.items() if name == module_name]
+            scopes.append(scope)
+    return scopes
+
+
+async def admit(user_id: int, tasks: Dict[str, str]) -> None:
+    """
+    Admit a submission of `tasks` (task id -> module name) as a whole
+    Raises AdmissionDenied if a limit is exceeded. Admits while Redis is
+    unavailable, like the other Redis-backed features of the API.
+    """
+    scopes = build_scopes(user_id, tasks)
+    if not scopes:
+        return
+    for scope in scopes:
+        if scope.rate and len(scope.task_ids) > scope.burst:
+            raise AdmissionDenied(f"Submission exceeds the rate limit of {scope.name}: burst of {scope.burst} tasks")
+        if scope.cap and len(scope.task_ids) > scope.cap:
+            raise AdmissionDenied(f"Submission exceeds the concurrency cap of {scope.name}: {scope.cap} tasks")
+
+    keys = []
+    args = [time.time(), settings.ADMISSION_SLOT_TTL_SECONDS, TASK_PREFIX]
+    for scope in scopes:
+        keys += [BUCKET_PREFIX + scope.key, SLOTS_PREFIX + scope.key]
+        args += [scope.rate, scope.burst, scope.cap, len(scope.task_ids), *scope.task_ids]
+    client = get_async_redis()
+    try:
+        reply = await client.eval(_ADMIT_SCRIPT, len(keys), *keys, *args)
+        if reply[0] != 1:
+            scope = scopes[int(reply[1]) - 1]
+            if reply[2] in (b"rate", "rate"):
+                raise AdmissionDenied(
+                    f"Rate limit of {scope.name} exceeded: {round(scope.rate * 60)} tasks per minute",
+                    retry_after=max(1, math.ceil(float(reply[3])))
+                )
+            raise AdmissionDenied(
+                f"Concurrency cap of {scope.name} reached: {scope.cap} unfinished tasks",
+                retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS
+            )
+    except redis.RedisError as e:
+        logger.warning("Admission control unavailable: %s", e)
+
+
+def release(task_id: str) -> None:
+    """Free the slots of a finished task (worker side); releasing twice is harmless"""
+    if not holds_slots():
+        return
+    client = get_redis()
+    try:
+        slot_keys = client.get(TASK_PREFIX + task_id)
+        if slot_keys is None:
+            return
+        pipe = client.pipeline(transaction=False)
+        for key in json.loads(slot_keys):
+            pipe.zrem(key, task_id)
+        pipe.delete(TASK_PREFIX + task_id)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to release admission slots of task %s: %s", task_id, e)
+
+
+async def async_release(task_ids: List[str]) -> None:
+    """Async variant of release for the API: cancelled or never published tasks"""
+    if not holds_slots() or not task_ids:
+        return
+    client = get_async_redis()
+    try:
+        values = await client.mget([TASK_PREFIX + task_id for task_id in task_ids])
+        pipe = client.pipeline(transaction=False)
+        for task_id, slot_keys in zip(task_ids, values):
+            for key in json.loads(slot_keys) if slot_keys is not None else []:
+                pipe.zrem(key, task_id)
+            pipe.delete(TASK_PREFIX + task_id)
+        await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to release admission slots: %s", e)
@@ -0,0 +1,174 @@
+"""
+Content-addressed blob store for large task results
+Results above RESULT_OFFLOAD_THRESHOLD_BYTES are compressed and written here;
+the result backend and the tasks table only keep a small reference to them.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Iterator, Optional
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+try:
+    import boto3
+except ImportError:  # only needed for BLOB_STORE_BACKEND=s3
+    boto3 = None
+
+CHUNK_SIZE = 64 * 1024
+
+# Compression name -> (file suffix, HTTP Content-Encoding)
+ENCODINGS = {
+    "gzip": (".gz", "gzip"),
+    "zstd": (".zst", "zstd"),
+}
+
+
+class FilesystemBlobStore:
+    """Blobs stored as files under a root directory, sharded by key prefix"""
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes) -> None:
+        """Write a blob atomically; readers never see a partial file"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive) of a blob"""
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+
+class S3BlobStore:
+    """Blobs stored in an S3-compatible bucket"""
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None):
+        if boto3 is None:
+            raise RuntimeError("BLOB_STORE_BACKEND=s3 requires boto3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+
+    def put(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)["ContentLength"]
+        except self.client.exceptions.ClientError:
+            return None
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.prefix + key, Range=f"bytes={start}-{end}"
+        )
+        yield from response["Body"].iter_chunks(CHUNK_SIZE)
+
+
+_blob_store = None
+
+
+def get_blob_store():
+    """Get the process-wide blob store configured by BLOB_STORE_BACKEND"""
+    global _blob_store
+    if _blob_store is None:
+        if settings.BLOB_STORE_BACKEND == "s3":
+            _blob_store = S3BlobStore(settings.S3_BUCKET, settings.S3_PREFIX, settings.S3_ENDPOINT_URL)
+        else:
+            _blob_store = FilesystemBlobStore(settings.BLOB_STORE_PATH)
+    return _blob_store
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    """Compress deterministically, so identical results map to identical blobs"""
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data, mtime=0)
+
+
+def offload_result(result):
+    """
+    Replace a large result by a reference to a compressed blob
+    Small results are returned unchanged
+    """
+    data = json.dumps(result, default=str).encode("utf-8")
+    if len(data) < settings.RESULT_OFFLOAD_THRESHOLD_BYTES:
+        return result
+
+    compression = settings.BLOB_COMPRESSION if settings.BLOB_COMPRESSION == "gzip" or zstandard else "gzip"
+    suffix, content_encoding = ENCODINGS[compression]
+    digest = hashlib.sha256(data).hexdigest()
+    key = f"{digest[:2]}/{digest[2:4]}/{digest}.json{suffix}"
+
+    store = get_blob_store()
+    if not store.exists(key):
+        store.put(key, compress(data, compression))
+    return {
+        "result_ref": {
+            "key": key,
+            "content_type": "application/json",
+            "content_encoding": content_encoding,
+            "size": len(data),
+        }
+    }
+
+
+def get_result_ref(result) -> Optional[dict]:
+    """The blob reference of an offloaded result, None for inline results"""
+    if isinstance(result, dict) and set(result) == {"result_ref"}:
+        return result["result_ref"]
+    return None
+
+
+def load_result(result):
+    """The full content of an offloaded result; inline results are returned unchanged"""
+    ref = get_result_ref(result)
+    if ref is None:
+        return result
+    store = get_blob_store()
+    size = store.size(ref["key"])
+    if size is None:
+        raise FileNotFoundError(f"Result blob not found: {ref['key']}")
+    data = b"".join(store.iter_range(ref["key"], 0, size - 1))
+    if ref["content_encoding"] == "zstd":
+        data = zstandard.ZstdDecompressor().decompress(data, max_output_size=ref["size"])
+    else:
+        data = gzip.decompress(data)
+    return json.loads(data)
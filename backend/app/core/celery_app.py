@@ -1,5 +1,8 @@
 from celery import Celery
+from celery.schedules import crontab
+from kombu import Queue
 from app.core.config import settings
+from app.scripts.registry import MODULES
 
 celery_app = Celery(
     "zeus_worker",
@@ -7,13 +10,63 @@ celery_app = Celery(
     backend=settings.CELERY_RESULT_BACKEND
 )
 
+# Each module gets its own queue so slow image jobs (module2) never delay the
+# quick analyses queued behind them; workers subscribe to the queues they serve
+DEFAULT_QUEUE = "celery"
+MODULE_QUEUES = {spec.module_id: spec.queue for spec in MODULES.values()}
+
+# Message priorities, 0 is the most urgent (Redis transport semantics)
+MIN_PRIORITY = 0
+MAX_PRIORITY = 9
+DEFAULT_PRIORITY = 5
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Route medical script executions and workflow steps to the queue of their module"""
+    if name == "app.core.tasks.execute_medical_script":
+        module_name = args[0] if args else kwargs.get("module_name")
+        return {"queue": MODULE_QUEUES.get(module_name, DEFAULT_QUEUE)}
+    if name == "app.core.tasks.execute_workflow_step":
+        return {"queue": MODULE_QUEUES.get(kwargs["step"]["module_name"], DEFAULT_QUEUE)}
+    return None
+
+
 celery_app.conf.update(
     task_serializer='json',
     accept_content=['json'],
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    task_queues=[Queue(name, routing_key=name) for name in [DEFAULT_QUEUE] + sorted(set(MODULE_QUEUES.values()))],
+    task_default_queue=DEFAULT_QUEUE,
+    task_routes=(route_task,),
+    task_default_priority=DEFAULT_PRIORITY,
+    # Module scripts run for seconds: reserve one message per process at a
+    # time and acknowledge only after completion, so queued work stays
+    # available to idle workers and a crashed worker's task is redelivered
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    broker_transport_options={
+        'priority_steps': list(range(MIN_PRIORITY, MAX_PRIORITY + 1)),
+        'sep': ':',
+        'queue_order_strategy': 'priority',
+        # Unacknowledged tasks are redelivered after this long, must exceed
+        # the longest task runtime
+        'visibility_timeout': settings.CELERY_VISIBILITY_TIMEOUT_SECONDS,
+    },
+    # Task states and results expire from Redis; the tasks table is bounded
+    # by partition retention (app.db.partitions) instead
+    result_expires=settings.CELERY_RESULT_EXPIRES_SECONDS,
+    # Run by the beat service
+    beat_schedule={
+        'maintain-task-partitions': {
+            'task': 'app.core.tasks.maintain_task_partitions',
+            'schedule': crontab(minute=0, hour=settings.TASK_MAINTENANCE_HOUR),
+        },
+    },
 )
 
-# Import tasks to register them with Celery
-celery_app.conf.imports = ('app.core.tasks',)
+# Import tasks to register them with Celery, and the signal handlers that
+# publish their state transitions
+celery_app.conf.imports = ('app.core.tasks', 'app.core.signals')
@@ -0,0 +1,116 @@
+"""
+Task event pub/sub
+Workers publish task state transitions to Redis, the API streams them to clients
+"""
+import json
+import logging
+from typing import List, Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which no further events are published for a task
+TERMINAL_STATUSES = {"success", "failed", "cancelled", "expired"}
+
+
+def task_channel(task_id: str) -> str:
+    """Redis pub/sub channel carrying events for a single task"""
+    return f"task-events:{task_id}"
+
+
+def partials_key(task_id: str) -> str:
+    """Redis list holding the partial results streamed by a task"""
+    return f"task-partials:{task_id}"
+
+
+def build_task_event(
+    task_id: str,
+    status: str,
+    result: Optional[dict] = None,
+    error: Optional[str] = None,
+    progress: Optional[dict] = None
+) -> dict:
+    """Build a task event with the same shape as the TaskStatus schema"""
+    return {
+        "task_id": task_id,
+        "status": status,
+        "result": result,
+        "error": error,
+        "progress": progress
+    }
+
+
+def publish_task_event(
+    task_id: str,
+    status: str,
+    result: Optional[dict] = None,
+    error: Optional[str] = None,
+    progress: Optional[dict] = None
+) -> None:
+    """
+    Publish a task state transition
+
+    Publishing is best effort: a Redis outage must never fail the task itself,
+    clients can still fall back to GET /modules/tasks/{task_id}.
+    """
+    event = build_task_event(task_id, status, result, error, progress)
+    try:
+        get_redis().publish(task_channel(task_id), json.dumps(event, default=str))
+    except redis.RedisError as e:
+        logger.warning("Failed to publish event for task %s: %s", task_id, e)
+
+
+def append_partial_result(task_id: str, partial: dict) -> Optional[int]:
+    """
+    Stream a partial result of a running task to Redis
+    Returns the number of partial results stored so far, or None if Redis is
+    unavailable: best effort like publishing, the task carries on without it
+    """
+    pipe = get_redis().pipeline()
+    pipe.rpush(partials_key(task_id), json.dumps(partial, default=str))
+    pipe.expire(partials_key(task_id), settings.PARTIAL_RESULTS_TTL_SECONDS)
+    try:
+        return pipe.execute()[0]
+    except redis.RedisError as e:
+        logger.warning("Failed to store partial result of task %s: %s", task_id, e)
+        return None
+
+
+async def read_partial_results(task_id: str, offset: int, limit: int) -> List[dict]:
+    """Read a slice of the partial results of a task"""
+    values = await get_async_redis().lrange(partials_key(task_id), offset, offset + limit - 1)
+    return [json.loads(value) for value in values]
+
+
+class TaskEventSubscription:
+    """
+    Subscription to the events of a single task
+
+    Use as an async context manager; the channel is subscribed on entry so no
+    event published afterwards can be missed.
+    """
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self._pubsub = get_async_redis().pubsub()
+
+    async def __aenter__(self) -> "TaskEventSubscription":
+        await self._pubsub.subscribe(task_channel(self.task_id))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self._pubsub.reset()
+
+    async def next_event(self, timeout: float) -> Optional[dict]:
+        """Wait up to `timeout` seconds for the next event, None if none arrived"""
+        message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        try:
+            return json.loads(message["data"])
+        except (TypeError, ValueError):
+            logger.warning("Discarding malformed event for task %s", self.task_id)
+            return None
@@ -0,0 +1,134 @@
+"""
+Prometheus metrics
+Request latency and DB query instrumentation for the API, hot-path timers,
+and task runtime, queue wait, failure, cancellation and expiry metrics
+recorded by the workers.
+All instruments are in-process counters and histograms, cheap enough to keep
+enabled in production.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import redis
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+from app.core.config import settings
+
+HTTP_REQUEST_DURATION = Histogram(
+    "zeus_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "zeus_http_request_db_queries",
+    "Database queries issued per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50)
+)
+DB_QUERY_DURATION = Histogram(
+    "zeus_db_query_duration_seconds",
+    "Database query latency",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+HOT_PATH_DURATION = Histogram(
+    "zeus_hot_path_duration_seconds",
+    "Latency of instrumented hot-path operations",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+TASK_RUNTIME = Histogram(
+    "zeus_task_runtime_seconds",
+    "Task execution time in the worker",
+    ["module", "state"],
+    buckets=(0.1, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 30, 60, 120, 300, 600)
+)
+TASK_QUEUE_WAIT = Histogram(
+    "zeus_task_queue_wait_seconds",
+    "Time between task publication and the start of its execution",
+    ["module"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+)
+TASK_FAILURES = Counter(
+    "zeus_task_failures_total",
+    "Tasks that raised an exception",
+    ["module"]
+)
+TASK_CANCELLED = Counter(
+    "zeus_task_cancelled_total",
+    "Tasks revoked before or during execution",
+    ["module"]
+)
+TASK_EXPIRED = Counter(
+    "zeus_task_expired_total",
+    "Tasks stopped by a time limit (soft, hard) or expired in the queue (expires)",
+    ["module", "limit"]
+)
+
+# Queries counted for the HTTP request being served, None outside requests
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+@contextmanager
+def timed(operation: str):
+    """Record the duration of a block under zeus_hot_path_duration_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        HOT_PATH_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+def begin_request_query_count() -> list:
+    """Start counting DB queries for the current request"""
+    counter = [0]
+    _request_queries.set(counter)
+    return counter
+
+
+def instrument_engine(sync_engine) -> None:
+    """Time every query executed through an engine (pass .sync_engine for async engines)"""
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_DURATION.observe(time.perf_counter() - conn.info["query_start_time"].pop())
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+class QueueDepthCollector:
+    """Report the number of messages waiting in each Celery queue at scrape time"""
+    def __init__(self, queues, priority_steps, separator: str):
+        self.queues = queues
+        self.priority_steps = priority_steps
+        self.separator = separator
+        self._client = None
+
+    def collect(self):
+        gauge = GaugeMetricFamily("zeus_queue_depth", "Messages waiting in a Celery queue", labels=["queue"])
+        if not settings.CELERY_BROKER_URL.startswith("redis"):
+            yield gauge
+            return
+        if self._client is None:
+            self._client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+        try:
+            pipe = self._client.pipeline()
+            for queue in self.queues:
+                # The Redis transport keeps one list per priority step
+                for step in self.priority_steps:
+                    pipe.llen(f"{queue}{self.separator}{step}" if step else queue)
+            lengths = pipe.execute()
+        except redis.RedisError:
+            yield gauge
+            return
+        per_queue = len(self.priority_steps)
+        for index, queue in enumerate(self.queues):
+            gauge.add_metric([queue], sum(lengths[index * per_queue:(index + 1) * per_queue]))
+        yield gauge
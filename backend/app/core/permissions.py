@@ -0,0 +1,152 @@
+"""
+Permission and module-catalog cache
+The module catalog (module registry filtered by the permissions table) and
+users loaded for authorization are cached per process for
+PERMISSION_CACHE_TTL_SECONDS. Every API replica subscribes to an
+invalidation channel, so a permission change is visible everywhere at once
+instead of after the TTL.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.redis_client import get_async_redis, get_redis
+from app.db.database import AsyncSessionLocal
+from app.db import models
+from app.models.user import User
+from app.scripts.registry import MODULES
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "permissions:invalidate"
+
+# Delay before resubscribing after the invalidation listener lost Redis
+LISTENER_RETRY_SECONDS = 5
+
+
+class ModuleCatalog:
+    """Runnable modules by id, in display order"""
+    def __init__(self, modules: Dict[str, dict]):
+        self.modules = modules
+
+    def for_permissions(self, permissions: Iterable[str]) -> List[dict]:
+        """Modules a holder of `permissions` may run"""
+        allowed = frozenset(permissions)
+        return [module for module in self.modules.values() if module["permission"] in allowed]
+
+
+_catalog: Optional[ModuleCatalog] = None
+_catalog_expiry = 0.0
+_catalog_lock: Optional[asyncio.Lock] = None
+
+# username -> (user, cache expiry as time.monotonic())
+_user_cache: Dict[str, Tuple[User, float]] = {}
+
+
+async def load_module_catalog() -> ModuleCatalog:
+    """Build the catalog: registered modules whose permission exists in the database"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(models.Permission.name))
+        permissions = set(result.scalars().all())
+
+    modules = {}
+    for module_id in sorted(MODULES):
+        spec = MODULES[module_id]
+        if spec.permission not in permissions:
+            continue
+        modules[module_id] = {
+            "id": module_id,
+            "name": spec.name,
+            "description": spec.description,
+            "permission": spec.permission,
+            "resource_class": spec.resource_class
+        }
+    return ModuleCatalog(modules)
+
+
+async def get_module_catalog() -> ModuleCatalog:
+    """Get the cached module catalog, reloading it once the TTL has passed"""
+    global _catalog, _catalog_expiry, _catalog_lock
+    if _catalog is not None and _catalog_expiry > time.monotonic():
+        return _catalog
+
+    if _catalog_lock is None:
+        _catalog_lock = asyncio.Lock()
+    async with _catalog_lock:
+        # Concurrent requests wait for a single reload
+        if _catalog is None or _catalog_expiry <= time.monotonic():
+            _catalog = await load_module_catalog()
+            _catalog_expiry = time.monotonic() + settings.PERMISSION_CACHE_TTL_SECONDS
+    return _catalog
+
+
+def get_cached_user(username: str) -> Optional[User]:
+    """A user loaded for authorization within the TTL, or None"""
+    cached = _user_cache.get(username)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    return None
+
+
+def cache_user(user: User) -> None:
+    """Remember a user loaded for authorization"""
+    _user_cache[user.username] = (user, time.monotonic() + settings.PERMISSION_CACHE_TTL_SECONDS)
+
+
+def clear_local_caches(username: Optional[str] = None) -> None:
+    """Drop one user's cached permissions, or everything when username is None"""
+    global _catalog
+    if username is None:
+        _catalog = None
+        _user_cache.clear()
+    else:
+        _user_cache.pop(username, None)
+
+
+def invalidate_permissions(username: Optional[str] = None) -> None:
+    """
+    Invalidate cached permissions on every API replica
+
+    Call after changing a user's permissions (together with
+    revoke_user_tokens) or, with no username, after changing the
+    permissions table.
+    """
+    clear_local_caches(username)
+    try:
+        get_redis().publish(INVALIDATION_CHANNEL, json.dumps({"username": username}))
+    except redis.RedisError as e:
+        logger.warning("Failed to publish permission invalidation: %s", e)
+
+
+async def listen_for_invalidations() -> None:
+    """
+    Apply invalidations published by any process, until cancelled
+
+    While Redis is unreachable invalidations may be missed, so all caches are
+    dropped on reconnect; until then entries still expire after the TTL.
+    """
+    while True:
+        pubsub = get_async_redis().pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            clear_local_caches()
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=60)
+                if message is None:
+                    continue
+                try:
+                    username = json.loads(message["data"]).get("username")
+                except (TypeError, ValueError, AttributeError):
+                    username = None
+                clear_local_caches(username)
+        except (redis.RedisError, OSError) as e:
+            logger.warning("Permission invalidation listener disconnected: %s", e)
+            await asyncio.sleep(LISTENER_RETRY_SECONDS)
+        finally:
+            await pubsub.reset()
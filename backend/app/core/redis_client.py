@@ -0,0 +1,29 @@
+"""
+Shared Redis clients
+One connection pool per process for the synchronous and asyncio clients
+"""
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+_redis_client: Optional[redis.Redis] = None
+_async_redis_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Get the process-wide synchronous Redis client"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Get the process-wide asyncio Redis client"""
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis.from_url(settings.REDIS_URL)
+    return _async_redis_client
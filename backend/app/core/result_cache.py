@@ -0,0 +1,162 @@
+"""
+Content-addressed result cache
+Module results are keyed on module name, script version and a canonical hash
+of the parameters, so identical executions are served without re-running the
+script. Also tracks in-flight executions so identical concurrent submissions
+of the same user attach to the task that is already running.
+"""
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis, get_async_redis
+from app.scripts.registry import get_script_version
+
+logger = logging.getLogger(__name__)
+
+ENTRY_PREFIX = "result-cache:entry:"
+INFLIGHT_PREFIX = "result-cache:inflight:"
+# In-flight marker a task claimed, so it is released knowing only the task id
+INFLIGHT_TASK_PREFIX = "result-cache:inflight-task:"
+# Sorted set of cache keys scored by last access time, used for LRU eviction
+LRU_INDEX_KEY = "result-cache:lru"
+HITS_KEY = "result-cache:hits"
+MISSES_KEY = "result-cache:misses"
+
+# Delete the in-flight marker a task claimed, only if it still points at the task
+_RELEASE_INFLIGHT_SCRIPT = """
+local marker = redis.call('GET', KEYS[1])
+redis.call('DEL', KEYS[1])
+if marker and redis.call('GET', marker) == ARGV[1] then
+    return redis.call('DEL', marker)
+end
+return 0
+"""
+
+
+def hash_parameters(parameters: dict) -> str:
+    """Hash parameters independently of key order and whitespace"""
+    canonical = json.dumps(parameters, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def result_cache_key(module_name: str, parameters: dict, input_version: Optional[str] = None) -> str:
+    """
+    Content address of a module execution
+    `input_version` identifies inputs read from outside the parameters
+    (ModuleSpec.input_version); the API's in-flight markers go without it
+    """
+    key = f"{module_name}:{get_script_version(module_name)}:{hash_parameters(parameters)}"
+    return f"{key}:{input_version}" if input_version else key
+
+
+def get_cached_result(cache_key: str) -> Optional[dict]:
+    """Look up a cached result and count the hit or miss (worker side)"""
+    client = get_redis()
+    try:
+        value = client.get(ENTRY_PREFIX + cache_key)
+        pipe = client.pipeline()
+        if value is None:
+            pipe.incr(MISSES_KEY)
+        else:
+            # Sliding expiry: the entry lives TTL seconds past its last use
+            pipe.incr(HITS_KEY)
+            pipe.expire(ENTRY_PREFIX + cache_key, settings.RESULT_CACHE_TTL_SECONDS)
+            pipe.zadd(LRU_INDEX_KEY, {cache_key: time.time()})
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Result cache lookup failed: %s", e)
+        return None
+    return json.loads(value) if value is not None else None
+
+
+def store_result(cache_key: str, result: dict) -> None:
+    """Cache a result, evicting expired and least recently used entries"""
+    client = get_redis()
+    now = time.time()
+    try:
+        pipe = client.pipeline()
+        pipe.set(ENTRY_PREFIX + cache_key, json.dumps(result, default=str), ex=settings.RESULT_CACHE_TTL_SECONDS)
+        pipe.zadd(LRU_INDEX_KEY, {cache_key: now})
+        pipe.zremrangebyscore(LRU_INDEX_KEY, "-inf", now - settings.RESULT_CACHE_TTL_SECONDS)
+        pipe.zcard(LRU_INDEX_KEY)
+        size = pipe.execute()[-1]
+        
+        excess = size - settings.RESULT_CACHE_MAX_ENTRIES
+        if excess > 0:
+            evicted = [member for member, _ in client.zpopmin(LRU_INDEX_KEY, excess)]
+            client.delete(*[ENTRY_PREFIX + member.decode() for member in evicted])
+    except redis.RedisError as e:
+        logger.warning("Result cache store failed: %s", e)
+
+
+async def claim_inflight(cache_key: str, task_id: str, user_id: int) -> Optional[str]:
+    """
+    Register `task_id` as the user's running execution for `cache_key`
+
+    Returns None if the claim succeeded, otherwise the id of the user's task
+    that already runs the identical execution. Markers are per user, so a
+    submitter is only ever handed a task recorded under their own name.
+    """
+    client = get_async_redis()
+    key = f"{INFLIGHT_PREFIX}{user_id}:{cache_key}"
+    try:
+        # Retry once: the running task may finish between SET and GET
+        for _ in range(2):
+            if await client.set(key, task_id, nx=True, ex=settings.INFLIGHT_DEDUP_TTL_SECONDS):
+                await client.set(INFLIGHT_TASK_PREFIX + task_id, key, ex=settings.INFLIGHT_DEDUP_TTL_SECONDS)
+                return None
+            existing = await client.get(key)
+            if existing is not None:
+                return existing.decode()
+    except redis.RedisError as e:
+        logger.warning("In-flight dedup unavailable: %s", e)
+    return None
+
+
+def release_inflight(task_id: str) -> None:
+    """Drop the in-flight marker once the task owning it has finished"""
+    try:
+        get_redis().eval(_RELEASE_INFLIGHT_SCRIPT, 1, INFLIGHT_TASK_PREFIX + task_id, task_id)
+    except redis.RedisError as e:
+        logger.warning("Failed to release in-flight marker: %s", e)
+
+
+async def async_release_inflight(task_id: str) -> None:
+    """Async variant of release_inflight, for the API when publishing fails"""
+    try:
+        await get_async_redis().eval(_RELEASE_INFLIGHT_SCRIPT, 1, INFLIGHT_TASK_PREFIX + task_id, task_id)
+    except redis.RedisError as e:
+        logger.warning("Failed to release in-flight marker: %s", e)
+
+
+async def get_cache_stats() -> dict:
+    """
+    Hit and miss counters of the result cache
+    All zero, with available false, while Redis is unreachable
+    """
+    client = get_async_redis()
+    pipe = client.pipeline()
+    pipe.get(HITS_KEY)
+    pipe.get(MISSES_KEY)
+    pipe.zcard(LRU_INDEX_KEY)
+    try:
+        hits, misses, entries = await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Result cache stats unavailable: %s", e)
+        return {"hits": 0, "misses": 0, "hit_ratio": 0.0, "entries": 0, "available": False}
+    hits = int(hits or 0)
+    misses = int(misses or 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        "entries": entries,
+        "available": True
+    }
@@ -1,12 +1,31 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import redis
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.core.config import settings
+from app.core.redis_client import get_async_redis, get_redis
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Pinning min and max rounds makes needs_update() flag hashes of any other cost
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
 
@@ -20,6 +39,71 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password, and rehash it if the stored hash is outdated
+    Returns (valid, new hash or None)
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+_password_executor: Optional[Executor] = None
+
+# HMAC of (username, stored hash, password) -> cache expiry as time.monotonic()
+_verified_credentials: "OrderedDict[str, float]" = OrderedDict()
+
+
+def get_password_executor() -> Executor:
+    """Pool that runs bcrypt off the event loop, bounded to PASSWORD_HASH_WORKERS"""
+    global _password_executor
+    if _password_executor is None:
+        workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        if settings.PASSWORD_HASH_POOL == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _password_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    return _password_executor
+
+
+def credential_cache_key(username: str, hashed_password: str, plain_password: str) -> str:
+    """Keyed digest identifying a verified credential without storing the password"""
+    message = "\0".join((username, hashed_password, plain_password)).encode("utf-8")
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+async def verify_password_async(
+    username: str,
+    plain_password: str,
+    hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a login password without blocking the event loop
+
+    Successful verifications are remembered for LOGIN_VERIFY_CACHE_SECONDS.
+    Returns (valid, new hash or None) like verify_and_update_password; the
+    caller must store the new hash when one is returned.
+    """
+    ttl = settings.LOGIN_VERIFY_CACHE_SECONDS
+    key = credential_cache_key(username, hashed_password, plain_password) if ttl > 0 else None
+    now = time.monotonic()
+    if key is not None:
+        expiry = _verified_credentials.get(key)
+        if expiry is not None and expiry > now:
+            return True, None
+    
+    loop = asyncio.get_running_loop()
+    valid, new_hash = await loop.run_in_executor(
+        get_password_executor(), verify_and_update_password, plain_password, hashed_password
+    )
+    # A hash being upgraded is not cached, the next login must see the new one
+    if valid and new_hash is None and key is not None:
+        _verified_credentials[key] = now + ttl
+        _verified_credentials.move_to_end(key)
+        while len(_verified_credentials) > settings.LOGIN_VERIFY_CACHE_MAX_ENTRIES:
+            _verified_credentials.popitem(last=False)
+    return valid, new_hash
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -39,3 +123,49 @@ def decode_access_token(token: str) -> Optional[dict]:
         return payload
     except JWTError:
         return None
+
+
+# username -> (token version, cache expiry as time.monotonic())
+_token_version_cache: Dict[str, Tuple[int, float]] = {}
+
+
+def token_version_key(username: str) -> str:
+    """Redis key holding the current token version of a user"""
+    return f"token-version:{username}"
+
+
+async def get_token_version(username: str, use_cache: bool = True) -> int:
+    """
+    Get the current token version of a user
+
+    Cached in-process for AUTH_TOKEN_VERSION_CACHE_SECONDS, so revocation
+    takes at most that long to reach every API process. If Redis is
+    unreachable the last known version is kept.
+    """
+    now = time.monotonic()
+    cached = _token_version_cache.get(username)
+    if use_cache and cached and cached[1] > now:
+        return cached[0]
+    
+    try:
+        value = await get_async_redis().get(token_version_key(username))
+    except redis.RedisError as e:
+        logger.warning("Token version lookup failed for %s: %s", username, e)
+        return cached[0] if cached else 0
+    
+    version = int(value) if value is not None else 0
+    _token_version_cache[username] = (version, now + settings.AUTH_TOKEN_VERSION_CACHE_SECONDS)
+    return version
+
+
+def revoke_user_tokens(username: str) -> int:
+    """
+    Invalidate every token issued to a user so far
+
+    Call whenever a user's permissions change or the account is disabled,
+    otherwise stateless auth keeps honouring the permissions in old tokens
+    until they expire. Returns the new token version.
+    """
+    version = get_redis().incr(token_version_key(username))
+    _token_version_cache.pop(username, None)
+    return version
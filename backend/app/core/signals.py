@@ -0,0 +1,218 @@
+"""
+Celery signal handlers
+Runs inside the worker: persists task state transitions to the tasks table
+and publishes them to subscribed API processes as they happen
+"""
+import logging
+import os
+import time
+from datetime import datetime
+from celery.exceptions import SoftTimeLimitExceeded, TimeLimitExceeded
+from celery.signals import (
+    before_task_publish, worker_init, worker_process_init, worker_process_shutdown,
+    task_prerun, task_postrun, task_success, task_failure, task_retry, task_revoked
+)
+from prometheus_client import CollectorRegistry, start_http_server
+from prometheus_client import multiprocess
+from sqlalchemy.exc import SQLAlchemyError
+from app.core import admission
+from app.core.config import settings
+from app.core.events import publish_task_event
+from app.core.metrics import TASK_CANCELLED, TASK_EXPIRED, TASK_FAILURES, TASK_QUEUE_WAIT, TASK_RUNTIME
+from app.core.result_cache import release_inflight
+from app.core.workflows import WORKFLOW_STEP_TASK, abort_workflow
+from app.db.database import SessionLocal, engine
+from app.db import models
+
+logger = logging.getLogger(__name__)
+
+# Message header stamped at publication, used to measure queue wait time
+PUBLISHED_AT_HEADER = "zeus_published_at"
+
+# Tasks that have a row in the tasks table; others (maintenance) only report metrics
+TRACKED_TASKS = {"app.core.tasks.execute_medical_script", WORKFLOW_STEP_TASK}
+
+# task_id -> execution start (time.perf_counter()) of tasks running in this process
+_task_started = {}
+
+
+def module_label(sender, args, task_kwargs=None) -> str:
+    """Module a task executes, or the task name for other tasks"""
+    if sender is not None and sender.name == "app.core.tasks.execute_medical_script" and args:
+        return args[0]
+    if sender is not None and sender.name == WORKFLOW_STEP_TASK and task_kwargs:
+        return task_kwargs["step"]["module_name"]
+    return sender.name if sender is not None else "unknown"
+
+
+def stop_workflow(sender, task_kwargs, status: str) -> None:
+    """Cancel the pending steps of the workflow a step that did not succeed belongs to"""
+    if sender is not None and sender.name == WORKFLOW_STEP_TASK and task_kwargs:
+        abort_workflow(task_kwargs["workflow_id"], task_kwargs["step"]["step_id"], status)
+
+
+def is_tracked(task) -> bool:
+    return task is not None and task.name in TRACKED_TASKS
+
+
+def release_task_claim(sender, task_id: str) -> None:
+    """Drop the result cache's in-flight marker of a task that did not finish normally"""
+    if (settings.RESULT_CACHE_ENABLED and sender is not None
+            and sender.name == "app.core.tasks.execute_medical_script"):
+        release_inflight(task_id)
+
+
+def update_task_record(task_id: str, **fields) -> None:
+    """
+    Write task fields with a single UPDATE, no read beforehand
+
+    Best effort like event publishing: if the write fails the API still
+    falls back to the result backend for the task's state. A task cancelled
+    through the API stays cancelled whatever its execution reports later.
+    """
+    db = SessionLocal()
+    try:
+        db.query(models.Task).filter(
+            models.Task.task_id == task_id, models.Task.status != "cancelled"
+        ).update(
+            {**fields, "updated_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.warning("Failed to persist state of task %s: %s", task_id, e)
+    finally:
+        db.close()
+
+
+def record_transition(task_id: str, status: str, result=None, error=None) -> None:
+    """Persist a state transition, then notify subscribers"""
+    fields = {"status": status}
+    if result is not None:
+        fields["result"] = result
+    if error is not None:
+        fields["error"] = error
+    update_task_record(task_id, **fields)
+    publish_task_event(task_id, status, result=result, error=error)
+
+
+@before_task_publish.connect
+def on_before_task_publish(headers=None, **kwargs):
+    """Stamp the publication time (runs in the publishing process)"""
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@worker_init.connect
+def on_worker_init(sender=None, **kwargs):
+    """
+    Size the script pools by the worker's concurrency and serve worker
+    metrics, aggregated across pool processes in multiprocess mode
+    """
+    from app.scripts.parallel import set_worker_concurrency
+    set_worker_concurrency(getattr(sender, "concurrency", 1))
+    if not settings.WORKER_METRICS_PORT:
+        return
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(settings.WORKER_METRICS_PORT, registry=registry)
+    else:
+        start_http_server(settings.WORKER_METRICS_PORT)
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    """Drop connections inherited from the parent process after fork"""
+    engine.dispose(close=False)
+
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(pid=None, **kwargs):
+    """Discard live gauges of a pool process that exited"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, task=None, args=None, **kwargs):
+    """Task picked up by a worker"""
+    _task_started[task_id] = time.perf_counter()
+    published_at = task.request.get(PUBLISHED_AT_HEADER) if task is not None else None
+    if published_at:
+        TASK_QUEUE_WAIT.labels(module_label(task, args, kwargs.get("kwargs"))).observe(max(0.0, time.time() - published_at))
+    if is_tracked(task):
+        record_transition(task_id, "started")
+
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, task=None, args=None, state=None, **kwargs):
+    """Task returned or raised"""
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_RUNTIME.labels(module_label(task, args, kwargs.get("kwargs")), state or "UNKNOWN").observe(time.perf_counter() - started)
+    if is_tracked(task) and state != "RETRY":
+        admission.release(task_id)
+
+
+@task_success.connect
+def on_task_success(sender=None, result=None, **kwargs):
+    """Task finished successfully, or returned a partial result at its soft time limit"""
+    if not is_tracked(sender):
+        return
+    status = "expired" if getattr(sender.request, "stopped_by_time_limit", False) else "success"
+    # A workflow step returns what it passes on, its row records its own result
+    result = getattr(sender.request, "step_result", result)
+    record_transition(sender.request.id, status, result=result)
+
+
+@task_failure.connect
+def on_task_failure(sender=None, task_id=None, exception=None, args=None, **kwargs):
+    """
+    Task raised an exception
+    Also sent by the worker's main process when a task hits its hard time limit
+    """
+    task_kwargs = kwargs.get("kwargs")
+    module = module_label(sender, args, task_kwargs)
+    if isinstance(exception, (SoftTimeLimitExceeded, TimeLimitExceeded)):
+        limit = "soft" if isinstance(exception, SoftTimeLimitExceeded) else "hard"
+        TASK_EXPIRED.labels(module, limit).inc()
+        # A killed task never reaches its own cleanup
+        release_task_claim(sender, task_id)
+        if is_tracked(sender):
+            admission.release(task_id)
+            record_transition(task_id, "expired", error=f"Time limit exceeded ({limit})")
+        stop_workflow(sender, task_kwargs, "expired")
+        return
+    TASK_FAILURES.labels(module).inc()
+    if is_tracked(sender):
+        record_transition(task_id, "failed", error=str(exception))
+    stop_workflow(sender, task_kwargs, "failed")
+
+
+@task_revoked.connect
+def on_task_revoked(sender=None, request=None, terminated=None, expired=None, **kwargs):
+    """Task revoked while queued, terminated while running, or expired in the queue"""
+    args = getattr(request, "args", None)
+    task_kwargs = getattr(request, "kwargs", None)
+    module = module_label(sender, args, task_kwargs)
+    if expired:
+        TASK_EXPIRED.labels(module, "expires").inc()
+    else:
+        TASK_CANCELLED.labels(module).inc()
+    release_task_claim(sender, request.id)
+    if not is_tracked(sender):
+        return
+    admission.release(request.id)
+    record_transition(request.id, "expired" if expired else "cancelled",
+                      error="Expired before execution" if expired else "Cancelled")
+    stop_workflow(sender, task_kwargs, "expired" if expired else "cancelled")
+
+
+@task_retry.connect
+def on_task_retry(sender=None, request=None, reason=None, **kwargs):
+    """Task scheduled for retry"""
+    if not is_tracked(sender):
+        return
+    record_transition(request.id, "retry", error=str(reason))
@@ -1,5 +1,116 @@
+import logging
+from typing import List
+
+import redis
+from celery.exceptions import Ignore
+
+from app.core.blobstore import offload_result
 from app.core.celery_app import celery_app
-from app.scripts.medical_scripts import get_script
+# Publishing processes (the API) need the before_task_publish handler too
+from app.core.signals import record_transition, update_task_record
+from app.core.config import settings
+from app.core.events import append_partial_result, publish_task_event
+from app.core.metrics import TASK_CANCELLED, TASK_EXPIRED
+from app.core.redis_client import get_redis
+from app.core.result_cache import get_cached_result, release_inflight, result_cache_key, store_result
+from app.core.workflows import abort_workflow, merge_upstream, resolve_inputs
+from app.db.partitions import maintain
+from app.scripts.registry import get_module, get_script, run_script
+
+logger = logging.getLogger(__name__)
+
+
+def cancelled_key(task_id: str) -> str:
+    """Redis marker of a task cancelled through the API"""
+    return f"task-cancelled:{task_id}"
+
+
+def cancel_task(task_id: str) -> None:
+    """
+    Revoke a task: queued messages are discarded, a running execution is
+    terminated (SIGTERM to its worker process)
+    Workers only remember revocations in memory, so a marker in Redis also
+    stops the task if it reaches a worker that started after the revoke.
+    """
+    try:
+        get_redis().set(cancelled_key(task_id), 1, ex=settings.TASK_CANCEL_MARKER_TTL_SECONDS)
+    except redis.RedisError as e:
+        logger.warning("Failed to mark task %s as cancelled: %s", task_id, e)
+    celery_app.control.revoke(task_id, terminate=True, signal="SIGTERM")
+
+
+def is_cancelled(task_id: str) -> bool:
+    """Whether a task was cancelled through the API; False if Redis is unavailable"""
+    try:
+        return bool(get_redis().exists(cancelled_key(task_id)))
+    except redis.RedisError as e:
+        logger.warning("Failed to check cancellation of task %s: %s", task_id, e)
+        return False
+
+
+def make_progress_reporter(task):
+    """
+    Build the on_progress callback for a generator script
+    Partial results go to the result store, the PROGRESS state carries the
+    counts and is published to stream subscribers
+    """
+    partials = 0
+    
+    def report(update: dict) -> None:
+        nonlocal partials
+        if update.get("partial") is not None:
+            # Keeps the previous count if the partial result could not be stored
+            partials = append_partial_result(task.request.id, update["partial"]) or partials
+        progress = {
+            "processed": update.get("processed"),
+            "total": update.get("total"),
+            "partials": partials
+        }
+        task.update_state(state='PROGRESS', meta=progress)
+        publish_task_event(task.request.id, "progress", progress=progress)
+    
+    return report
+
+
+def run_module(task, module_name: str, parameters: dict):
+    """
+    Run a module script within a task and return its (offloaded) result
+    A partial result returned at the soft time limit sets
+    task.request.stopped_by_time_limit and is never cached.
+    """
+    # Get the script function
+    script_func = get_script(module_name)
+    if not script_func:
+        raise ValueError(f"Unknown module: {module_name}")
+    
+    # Serve identical executions from the result cache; the key includes the
+    # version of the knowledge base or input file the execution reads
+    cache_key = None
+    if settings.RESULT_CACHE_ENABLED:
+        input_version = get_module(module_name).get_input_version(parameters)
+        cache_key = result_cache_key(module_name, parameters, input_version)
+        cached = get_cached_result(cache_key)
+        if cached is not None:
+            return cached
+    
+    # Execute the script, splitting its chunks over up to the module's
+    # max_parallelism pool processes (imported here: the API process
+    # imports this module but never runs scripts)
+    from app.scripts.parallel import task_parallelism
+    with task_parallelism(get_module(module_name)):
+        result = run_script(script_func, parameters, on_progress=make_progress_reporter(task))
+    # A script stopped by the soft time limit returns a partial result,
+    # which is recorded as expired and never cached
+    partial = isinstance(result, dict) and result.get("status") == "partial"
+    if partial:
+        TASK_EXPIRED.labels(module_name, "soft").inc()
+        task.request.stopped_by_time_limit = True
+    # Large results travel as a blob reference instead of inline JSON
+    result = offload_result(result)
+    
+    if cache_key and not partial:
+        store_result(cache_key, result)
+    return result
 
 
 @celery_app.task(bind=True)
@@ -14,15 +125,13 @@ def execute_medical_script(self, module_name: str, parameters: dict):
     Returns:
         Result from the script execution
     """
+    if is_cancelled(self.request.id):
+        # Cancelled while queued and the revoke did not reach this worker
+        TASK_CANCELLED.labels(module_name).inc()
+        raise Ignore()
+    
     try:
-        # Get the script function
-        script_func = get_script(module_name)
-        if not script_func:
-            raise ValueError(f"Unknown module: {module_name}")
-        
-        # Execute the script
-        result = script_func(parameters)
-        return result
+        return run_module(self, module_name, parameters)
     except Exception as e:
         # Update task state to FAILURE with error info
         self.update_state(
@@ -30,3 +139,57 @@ def execute_medical_script(self, module_name: str, parameters: dict):
             meta={'error': str(e)}
         )
         raise
+    finally:
+        if settings.RESULT_CACHE_ENABLED:
+            release_inflight(self.request.id)
+
+
+@celery_app.task(bind=True)
+def execute_workflow_step(self, upstream=None, *, workflow_id: str, step: dict, carry: List[str]):
+    """
+    Execute one step of a workflow (app.core.workflows)
+    
+    Args:
+        upstream: What the previous level returned, None for the first level
+        workflow_id: Workflow the step belongs to
+        step: step_id, module_name, parameters and inputs of the step
+        carry: Ids of the results later levels read
+    
+    Returns:
+        The carried results, including this step's if later levels read it;
+        the step's own result is what its task row records
+    """
+    step_id, module_name = step["step_id"], step["module_name"]
+    if is_cancelled(self.request.id):
+        TASK_CANCELLED.labels(module_name).inc()
+        abort_workflow(workflow_id, step_id, "cancelled")
+        raise Ignore()
+    
+    # Failures are left to Celery to record: the chord of the next level
+    # reads this task's state back and needs the exception in its format
+    results = merge_upstream(upstream)
+    parameters = step["parameters"]
+    if step["inputs"]:
+        parameters = get_module(module_name).validate_parameters(
+            {**parameters, **resolve_inputs(step["inputs"], results)}
+        )
+        update_task_record(self.request.id, parameters=parameters)
+    result = run_module(self, module_name, parameters)
+    
+    if getattr(self.request, "stopped_by_time_limit", False):
+        # Later steps never run on a partial result: record it here, since
+        # an ignored task sends no success signal, and stop the workflow
+        record_transition(self.request.id, "expired", result=result)
+        abort_workflow(workflow_id, step_id, "expired")
+        raise Ignore()
+    
+    self.request.step_result = result
+    results[step_id] = result
+    return {carried: results[carried] for carried in carry if carried in results}
+
+
+@celery_app.task(ignore_result=True)
+def maintain_task_partitions():
+    """Create upcoming partitions of the tasks table and retire expired ones (Celery beat)"""
+    summary = maintain()
+    logger.info("Task partition maintenance: %s", summary)
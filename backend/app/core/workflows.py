@@ -0,0 +1,182 @@
+"""
+Multi-module workflows
+
+A workflow is a DAG of module steps. Steps are layered by dependency depth
+and run as a Celery chain of one group per level, which Celery turns into
+chords: a level starts once every step of the previous one has finished,
+entirely inside the workers.
+
+Results travel worker to worker: every step returns the upstream results
+that later levels still read (its "carry"), and a step's `inputs` map
+parameter names to "<step_id>.<path>" inside those results, resolved right
+before it runs. Each step is also a row in the tasks table (workflow_id,
+step_id) with its own status, progress and result.
+
+A step that fails, expires or is cancelled stops the workflow; the steps
+still pending after it are recorded as cancelled.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.admission import release
+from app.core.blobstore import load_result
+from app.core.events import TERMINAL_STATUSES, publish_task_event
+
+logger = logging.getLogger(__name__)
+
+# Name of the task executing workflow steps (app.core.tasks)
+WORKFLOW_STEP_TASK = "app.core.tasks.execute_workflow_step"
+
+
+def step_dependencies(step) -> set:
+    """Steps a step waits for: its depends_on plus the steps its inputs read"""
+    return set(step.depends_on) | {source.split(".", 1)[0] for source in step.inputs.values()}
+
+
+def workflow_levels(steps) -> List[List[str]]:
+    """
+    Step ids grouped by dependency depth, in submission order within a level
+    Raises ValueError for duplicate ids, unknown dependencies and cycles
+    """
+    ids = [step.step_id for step in steps]
+    duplicates = sorted({step_id for step_id in ids if ids.count(step_id) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate step ids: {', '.join(duplicates)}")
+    dependencies = {step.step_id: step_dependencies(step) for step in steps}
+    for step_id, needs in dependencies.items():
+        unknown = sorted(needs - set(ids))
+        if unknown:
+            raise ValueError(f"Step {step_id} depends on unknown steps: {', '.join(unknown)}")
+        if step_id in needs:
+            raise ValueError(f"Step {step_id} depends on itself")
+
+    depth = {}
+    while len(depth) < len(ids):
+        ready = [
+            step_id for step_id in ids
+            if step_id not in depth and all(need in depth for need in dependencies[step_id])
+        ]
+        if not ready:
+            cycle = sorted(set(ids) - set(depth))
+            raise ValueError(f"Workflow has a dependency cycle among: {', '.join(cycle)}")
+        for step_id in ready:
+            depth[step_id] = 1 + max((depth[need] for need in dependencies[step_id]), default=-1)
+    return [[step_id for step_id in ids if depth[step_id] == level] for level in range(max(depth.values()) + 1)]
+
+
+def level_carries(steps, levels: List[List[str]]) -> List[List[str]]:
+    """For each level, the ids of the results read by the inputs of later levels"""
+    readers = {step.step_id: {source.split(".", 1)[0] for source in step.inputs.values()} for step in steps}
+    carries = []
+    for index in range(len(levels)):
+        done = {step_id for level in levels[:index + 1] for step_id in level}
+        later = {source for level in levels[index + 1:] for step_id in level for source in readers[step_id]}
+        carries.append(sorted(done & later))
+    return carries
+
+
+def merge_upstream(upstream) -> Dict[str, dict]:
+    """
+    Results handed over by the previous level
+    A chord passes the list of its header's return values, a level of a
+    single step passes its return value as is
+    """
+    if upstream is None:
+        return {}
+    if isinstance(upstream, dict):
+        upstream = [upstream]
+    merged = {}
+    for carried in upstream:
+        merged.update(carried or {})
+    return merged
+
+
+def resolve_path(value, path: Iterable[str]):
+    for key in path:
+        if isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        elif isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            raise KeyError(key)
+    return value
+
+
+def resolve_inputs(inputs: Dict[str, str], upstream: Dict[str, dict]) -> dict:
+    """
+    Parameter values read from upstream results
+    Raises ValueError if a source does not exist
+    """
+    resolved = {}
+    loaded = {}
+    for name, source in inputs.items():
+        step_id, _, path = source.partition(".")
+        if step_id not in upstream:
+            raise ValueError(f"Input {name}: no result of step {step_id}")
+        if step_id not in loaded:
+            # Offloaded results are only fetched when an input reads them
+            loaded[step_id] = load_result(upstream[step_id])
+        try:
+            resolved[name] = resolve_path(loaded[step_id], path.split(".") if path else [])
+        except KeyError:
+            raise ValueError(f"Input {name}: {source} not found in the result of step {step_id}")
+    return resolved
+
+
+def abort_workflow(workflow_id: str, step_id: str, status: str) -> None:
+    """
+    Record the steps of a workflow that have not started as cancelled
+    Best effort, like the other state writes of the workers
+    """
+    # Imported here: only workers write workflow state
+    from app.db.database import SessionLocal
+    from app.db import models
+
+    error = f"Workflow stopped: step {step_id} {status}"
+    db = SessionLocal()
+    try:
+        query = db.query(models.Task).filter(
+            models.Task.workflow_id == workflow_id, models.Task.status == "pending"
+        )
+        task_ids = [task_id for (task_id,) in query.with_entities(models.Task.task_id)]
+        if task_ids:
+            db.query(models.Task).filter(
+                models.Task.task_id.in_(task_ids), models.Task.status == "pending"
+            ).update({"status": "cancelled", "error": error}, synchronize_session=False)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.warning("Failed to stop workflow %s: %s", workflow_id, e)
+        return
+    finally:
+        db.close()
+    for task_id in task_ids:
+        # Steps of later levels are never published, so no worker frees their slots
+        release(task_id)
+        publish_task_event(task_id, "cancelled", error=error)
+
+
+def workflow_status(statuses: List[str]) -> str:
+    """Overall status of a workflow from the statuses of its steps"""
+    for status in ("failed", "expired", "cancelled"):
+        if status in statuses:
+            if all(s in TERMINAL_STATUSES for s in statuses):
+                return status
+            return "stopping"
+    if all(s == "success" for s in statuses):
+        return "success"
+    if all(s == "pending" for s in statuses):
+        return "pending"
+    return "running"
+
+
+def step_spec(step, parameters: Optional[dict] = None) -> dict:
+    """Step description sent with the step task"""
+    return {
+        "step_id": step.step_id,
+        "module_name": step.module_name,
+        "parameters": parameters if parameters is not None else step.parameters,
+        "inputs": dict(step.inputs),
+    }
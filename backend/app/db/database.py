@@ -1,22 +1,124 @@
+import uuid
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+
+# Async drivers used by the API for each sync driver in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Translate a sync database URL to the matching asyncio driver"""
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+def engine_options(database_url: str, is_async: bool) -> dict:
+    """
+    create_engine keyword arguments for a database URL
+    Pool sizing and the statement timeout apply to PostgreSQL only. Behind a
+    transaction-pooling PgBouncer (DB_PGBOUNCER) connections are not pooled
+    client-side and asyncpg prepares statements under unique names without
+    caching them, since consecutive transactions may run on different server
+    connections.
+    """
+    options = {"pool_pre_ping": True}
+    if not make_url(database_url).drivername.startswith("postgresql"):
+        return options
+
+    connect_args = {}
+    if settings.DB_PGBOUNCER:
+        options["poolclass"] = NullPool
+        if is_async:
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=0,
+                prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+            )
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        )
+    # PgBouncer rejects startup parameters, set the timeout on the role instead
+    if settings.DB_STATEMENT_TIMEOUT_MS and not settings.DB_PGBOUNCER:
+        if is_async:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
 
-# Create database engine
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+# Create database engine (Celery workers and maintenance scripts)
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL, is_async=False))
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create async database engine (API endpoints)
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL), **engine_options(settings.DATABASE_URL, is_async=True)
+)
+
+# Read-only API queries go to the replica if one is configured
+if settings.DATABASE_READ_URL:
+    read_async_engine = create_async_engine(
+        get_async_database_url(settings.DATABASE_READ_URL),
+        **engine_options(settings.DATABASE_READ_URL, is_async=True)
+    )
+else:
+    read_async_engine = async_engine
+
+# Create async session factories; objects stay usable after commit
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    read_async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Query timing and per-request query counts for /metrics
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+if read_async_engine is not async_engine:
+    instrument_engine(read_async_engine.sync_engine)
+
 # Create base class for models
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency to get database session"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Dependency to get async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    """
+    Dependency to get an async session for read-only queries
+    Uses DATABASE_READ_URL if set, so results may lag the primary slightly
+    """
+    async with AsyncReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
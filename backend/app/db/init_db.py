@@ -1,94 +1,174 @@
 """
 Database initialization script
-Creates tables and seeds initial data
+Migrates the schema to the latest Alembic revision and seeds initial data
+
+Run once per deployment, not in every API process:
+
+    python -m app.db.init_db
+
+Safe to run concurrently and repeatedly: the work is serialized by a
+PostgreSQL advisory lock and the seed only inserts rows that are missing.
 """
-from sqlalchemy.exc import IntegrityError
-from app.db.database import engine, SessionLocal, Base
-from app.db.models import User, Permission
+import logging
+import os
+import time
+from typing import List, Tuple
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+import redis
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from app.db.database import engine
+from app.core.permissions import invalidate_permissions
+from app.db.models import User, Permission, user_permissions
+from app.db.partitions import ensure_partitions
+from app.db.users import permissions_changed
+from app.scripts.registry import MODULES
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Arbitrary application-wide key of the advisory lock serializing init_db runs
+INIT_DB_LOCK_ID = 0x5A657573
+INIT_DB_LOCK_POLL_SECONDS = 1
+
+# One permission per registered module
+SEED_PERMISSIONS = [
+    {"name": spec.permission, "description": spec.name} for spec in MODULES.values()
+]
+
+# Password for all users: "secret"
+# Using the same hash as in the original code for compatibility
+SEED_PASSWORD_HASH = "$2b$12$EixZaYVK1fsbw1ZfbX3OXePaWxn96p36WQoeG6Lruj3vjPGga31lW"
+
+SEED_USERS = {
+    "admin": ["module1", "module2", "module3"],
+    "user1": ["module1", "module2"],
+    "user2": ["module3"],
+}
+
+
+def get_alembic_config() -> Config:
+    """Alembic configuration usable from any working directory"""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    return config
+
+
+def insert_ignore_conflicts(connection, table, rows, index_elements):
+    """INSERT ... ON CONFLICT DO NOTHING for one batch of rows"""
+    if not rows:
+        return
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    connection.execute(
+        dialect_insert(table).on_conflict_do_nothing(index_elements=index_elements),
+        rows
+    )
+
+
+def seed(connection) -> Tuple[bool, List[str]]:
+    """
+    Insert the seed permissions, users and grants that do not exist yet
+    Returns whether permissions were added, and the users that existed
+    before and were granted permissions.
+    """
+    existing_permissions = set(connection.execute(select(Permission.name)).scalars())
+    insert_ignore_conflicts(connection, Permission.__table__, SEED_PERMISSIONS, ["name"])
+    existing_users = set(connection.execute(
+        select(User.username).where(User.username.in_(list(SEED_USERS)))
+    ).scalars())
+    insert_ignore_conflicts(
+        connection,
+        User.__table__,
+        [{"username": username, "hashed_password": SEED_PASSWORD_HASH} for username in SEED_USERS],
+        ["username"]
+    )
+
+    permission_ids = dict(connection.execute(select(Permission.name, Permission.id)).all())
+    user_ids = dict(connection.execute(
+        select(User.username, User.id).where(User.username.in_(list(SEED_USERS)))
+    ).all())
+    held = set(connection.execute(
+        select(user_permissions.c.user_id, user_permissions.c.permission_id)
+        .where(user_permissions.c.user_id.in_(list(user_ids.values())))
+    ).tuples())
+    grants = [
+        {"user_id": user_ids[username], "permission_id": permission_ids[name]}
+        for username, names in SEED_USERS.items()
+        for name in names
+        if (user_ids[username], permission_ids[name]) not in held
+    ]
+    insert_ignore_conflicts(connection, user_permissions, grants, ["user_id", "permission_id"])
+    granted = {grant["user_id"] for grant in grants}
+    changed_users = sorted(username for username in existing_users if user_ids[username] in granted)
+    return not existing_permissions.issuperset(permission_ids), changed_users
+
+
+def acquire_init_lock(connection) -> None:
+    """
+    Wait for the session-level init lock
+
+    Polled rather than blocking in pg_advisory_lock: a waiter stuck inside a
+    statement holds a snapshot, which CREATE INDEX CONCURRENTLY in the lock
+    holder's migrations would wait for, deadlocking both.
+    """
+    while not connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": INIT_DB_LOCK_ID}).scalar():
+        connection.commit()
+        time.sleep(INIT_DB_LOCK_POLL_SECONDS)
+    connection.commit()
 
 
 def init_db():
-    """Initialize database with tables and seed data"""
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
-    
-    # Create session
-    db = SessionLocal()
-    
+    """Migrate to the latest schema and seed initial data, holding the init lock"""
+    with engine.connect() as connection:
+        is_postgresql = connection.dialect.name == "postgresql"
+        if is_postgresql:
+            # Session-level lock: it survives the commits below
+            acquire_init_lock(connection)
+        try:
+            config = get_alembic_config()
+            config.attributes["connection"] = connection
+            command.upgrade(config, "head")
+            connection.commit()
+
+            # Partitions of the tasks table for the months ahead
+            ensure_partitions(connection)
+
+            permissions_added, changed_users = seed(connection)
+            connection.commit()
+        finally:
+            if is_postgresql:
+                connection.rollback()
+                connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": INIT_DB_LOCK_ID})
+                connection.commit()
+    # Grants only add permissions, so tokens missing them are merely stale
     try:
-        # Create permissions with ON CONFLICT handling
-        permissions = {
-            "module1": {"name": "module1", "description": "Patient Data Analysis"},
-            "module2": {"name": "module2", "description": "Medical Image Processing"},
-            "module3": {"name": "module3", "description": "Drug Interaction Analysis"}
-        }
-        
-        permission_objs = {}
-        for key, perm_data in permissions.items():
-            try:
-                # Try to get existing permission
-                perm = db.query(Permission).filter(Permission.name == perm_data["name"]).first()
-                if not perm:
-                    # Create new permission
-                    perm = Permission(**perm_data)
-                    db.add(perm)
-                    db.commit()
-                    db.refresh(perm)
-                permission_objs[key] = perm
-            except IntegrityError:
-                db.rollback()
-                # If conflict, get the existing permission
-                perm = db.query(Permission).filter(Permission.name == perm_data["name"]).first()
-                permission_objs[key] = perm
-        
-        # Create users with permissions
-        # Password for all users: "secret"
-        # Using the same hash as in the original code for compatibility
-        hashed_password = "$2b$12$EixZaYVK1fsbw1ZfbX3OXePaWxn96p36WQoeG6Lruj3vjPGga31lW"
-        
-        users_data = [
-            {
-                "username": "admin",
-                "hashed_password": hashed_password,
-                "permissions": [permission_objs["module1"], permission_objs["module2"], permission_objs["module3"]]
-            },
-            {
-                "username": "user1",
-                "hashed_password": hashed_password,
-                "permissions": [permission_objs["module1"], permission_objs["module2"]]
-            },
-            {
-                "username": "user2",
-                "hashed_password": hashed_password,
-                "permissions": [permission_objs["module3"]]
-            }
-        ]
-        
-        for user_data in users_data:
-            try:
-                # Check if user already exists
-                existing_user = db.query(User).filter(User.username == user_data["username"]).first()
-                if not existing_user:
-                    user = User(
-                        username=user_data["username"],
-                        hashed_password=user_data["hashed_password"],
-                        permissions=user_data["permissions"]
-                    )
-                    db.add(user)
-                    db.commit()
-            except IntegrityError:
-                db.rollback()
-                # User already exists, skip
-                continue
-        
-        print("Database initialized successfully with seed data")
-        
-    except Exception as e:
-        print(f"Error initializing database: {e}")
-        db.rollback()
-        raise
-    finally:
-        db.close()
+        permissions_changed(changed_users)
+    except redis.RedisError as e:
+        logger.warning("Failed to revoke tokens of users granted seed permissions: %s", e)
+    # New permissions add modules to the catalog cached by the API replicas
+    if permissions_added:
+        invalidate_permissions()
+    print("Database initialized successfully with seed data")
+
+
+def check_schema_version():
+    """
+    Fail fast if the database is not at the latest migration
+    Cheap enough for every process start: one query, no DDL
+    """
+    expected = set(ScriptDirectory.from_config(get_alembic_config()).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current != expected:
+        raise RuntimeError(
+            f"Database schema is at revision {', '.join(sorted(current)) or 'none'}, "
+            f"expected {', '.join(sorted(expected))}. Run `python -m app.db.init_db` first."
+        )
 
 
 if __name__ == "__main__":
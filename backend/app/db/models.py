@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, Table, Text, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -40,19 +40,35 @@ class Permission(Base):
 
 
 class Task(Base):
-    """Task model for database - stores task history and results"""
+    """
+    Task model for database - stores task history and results
+    On PostgreSQL the table is partitioned by month on created_at (alembic
+    revision 0003, app.db.partitions): its primary key is (id, created_at)
+    and task_id is indexed but not unique. id alone still identifies a row
+    and stays the primary key of the mapping; it has no index of its own.
+    """
     __tablename__ = "tasks"
 
-    id = Column(Integer, primary_key=True, index=True)
-    task_id = Column(String(255), unique=True, index=True, nullable=False)  # Celery task ID
+    id = Column(Integer, primary_key=True)
+    task_id = Column(String(255), index=True, nullable=False)  # Celery task ID
+    group_id = Column(String(255), index=True)  # Celery group ID for batch submissions
+    workflow_id = Column(String(255), index=True)  # Workflow the task is a step of
+    step_id = Column(String(100))  # Step id within the workflow
     module_name = Column(String(50), nullable=False)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     status = Column(String(20), nullable=False)  # pending, success, failed, etc.
     parameters = Column(JSON)
     result = Column(JSON)
     error = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Partition key
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     user = relationship("User", back_populates="tasks")
+
+
+# Task history indexes (alembic revision 0002): history pages filter on the
+# owning user, optionally on module or status, and page by (created_at, id)
+Index('ix_tasks_user_created', Task.user_id, Task.created_at.desc(), Task.id.desc())
+Index('ix_tasks_user_module_created', Task.user_id, Task.module_name, Task.created_at.desc(), Task.id.desc())
+Index('ix_tasks_user_status_created', Task.user_id, Task.status, Task.created_at.desc(), Task.id.desc())
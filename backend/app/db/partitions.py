@@ -0,0 +1,212 @@
+"""
+Maintenance of the monthly partitions of the tasks table (PostgreSQL)
+
+Alembic revision 0003 partitions tasks by month on created_at, with rows
+outside every partition kept in tasks_default. ensure_partitions() creates the
+partitions of the current and the next TASK_PARTITION_PREMAKE_MONTHS months;
+retire_partitions() detaches partitions older than TASK_RETENTION_MONTHS full
+months and, per TASK_RETENTION_ACTION, archives them to gzipped JSON Lines
+files in TASK_ARCHIVE_DIR and drops them, drops them, or leaves them as
+standalone tables.
+
+Run daily by Celery beat (maintain_task_partitions), after migrations by
+init_db, or by hand:
+
+    python -m app.db.partitions
+"""
+import gzip
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.database import engine
+
+# Arbitrary application-wide key of the advisory lock serializing maintenance runs
+MAINTENANCE_LOCK_ID = 0x5A657574
+
+# DDL on tasks queues every query behind it while waiting for its lock, so
+# give up instead and retry on the next run
+DDL_LOCK_TIMEOUT = "10s"
+
+PARTITION_NAME = re.compile(r"^tasks_y(\d{4})m(\d{2})$")
+
+RETENTION_ACTIONS = ("archive", "detach", "drop")
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"tasks_y{month.year:04d}m{month.month:02d}"
+
+
+def current_month() -> date:
+    """Current month in UTC, the time zone of created_at"""
+    return datetime.utcnow().date().replace(day=1)
+
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('tasks')")
+    ).scalar())
+
+
+def monthly_tables(connection, attached: bool) -> Dict[date, str]:
+    """Monthly partitions of tasks, or tables detached from it, by month"""
+    if attached:
+        query = text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'tasks'::regclass"
+        )
+    else:
+        query = text(
+            "SELECT relname FROM pg_class "
+            "WHERE relkind = 'r' AND NOT relispartition AND relnamespace = current_schema()::regnamespace"
+        )
+    tables = {}
+    for name in connection.execute(query).scalars():
+        match = PARTITION_NAME.match(name)
+        if match:
+            tables[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return tables
+
+
+def create_partition(connection, month: date) -> str:
+    """
+    Create and attach the partition of a month
+    Rows of the month already in tasks_default are moved into it first, which
+    attaching would otherwise refuse. Inserts into tasks wait until the
+    partition is attached, so none of the month lands in tasks_default meanwhile.
+    """
+    name = partition_name(month)
+    bounds = {"start": month, "stop": add_months(month, 1)}
+    connection.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+    # Inserts wait on the parent, before they are routed to a partition, and
+    # then go to the attached partition; locked in the order ATTACH takes them
+    connection.execute(text("LOCK TABLE ONLY tasks IN SHARE ROW EXCLUSIVE MODE"))
+    connection.execute(text("LOCK TABLE tasks_default IN ACCESS EXCLUSIVE MODE"))
+    connection.execute(text(f"CREATE TABLE {name} (LIKE tasks INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(text(
+        f"WITH moved AS (DELETE FROM tasks_default WHERE created_at >= :start AND created_at < :stop RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    connection.execute(text(
+        f"ALTER TABLE tasks ATTACH PARTITION {name} FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['stop']}')"
+    ))
+    connection.commit()
+    return name
+
+
+def ensure_partitions(connection, today: Optional[date] = None) -> List[str]:
+    """Create the missing partitions of the current and upcoming months"""
+    if not is_partitioned(connection):
+        return []
+    month = (today or current_month()).replace(day=1)
+    existing = monthly_tables(connection, attached=True)
+    created = []
+    for offset in range(settings.TASK_PARTITION_PREMAKE_MONTHS + 1):
+        target = add_months(month, offset)
+        if target not in existing:
+            created.append(create_partition(connection, target))
+    return created
+
+
+def archive_table(connection, name: str, directory: str) -> str:
+    """
+    Write all rows of a table to <directory>/<name>.jsonl.gz, one JSON object
+    per line, and return the path
+    The file is complete and synced to disk once this returns.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.jsonl.gz")
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    # Streamed through a server-side cursor
+    rows = connection.execute(
+        text(f"SELECT row_to_json(t)::text FROM {name} t ORDER BY id").execution_options(yield_per=1000)
+    )
+    try:
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(filename=f"{name}.jsonl", mode="wb", fileobj=raw) as f:
+                for (line,) in rows:
+                    f.write(line.encode("utf-8") + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    finally:
+        rows.close()
+    return path
+
+
+def retire_partitions(connection, today: Optional[date] = None) -> List[str]:
+    """
+    Apply the retention policy to partitions of months before the cutoff
+    Partitions are detached first, in their own short transaction, so the
+    archive is written without holding locks on tasks. Tables detached by
+    an earlier run whose archive failed, or while the action was "detach",
+    are archived or dropped as well unless the action is "detach".
+    """
+    if not settings.TASK_RETENTION_MONTHS or not is_partitioned(connection):
+        return []
+    action = settings.TASK_RETENTION_ACTION
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"Unknown TASK_RETENTION_ACTION: {action}")
+    cutoff = add_months((today or current_month()).replace(day=1), -settings.TASK_RETENTION_MONTHS)
+
+    retired = []
+    for month, name in sorted(monthly_tables(connection, attached=True).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        connection.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+        connection.execute(text(f"ALTER TABLE tasks DETACH PARTITION {name}"))
+        connection.commit()
+        retired.append(name)
+    if action == "detach":
+        return retired
+
+    for month, name in sorted(monthly_tables(connection, attached=False).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        if action == "archive":
+            archive_table(connection, name, settings.TASK_ARCHIVE_DIR)
+        connection.execute(text(f"DROP TABLE {name}"))
+        connection.commit()
+        if name not in retired:
+            retired.append(name)
+    return retired
+
+
+def maintain(today: Optional[date] = None) -> dict:
+    """Create upcoming partitions and retire expired ones, unless another run holds the lock"""
+    with engine.connect() as connection:
+        if not is_partitioned(connection):
+            return {"created": [], "retired": []}
+        if not connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}).scalar():
+            return {"skipped": True}
+        connection.commit()
+        try:
+            return {
+                "created": ensure_partitions(connection, today),
+                "retired": retire_partitions(connection, today),
+            }
+        finally:
+            connection.rollback()
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+            connection.commit()
+
+
+if __name__ == "__main__":
+    print(maintain())
@@ -0,0 +1,83 @@
+"""
+Management of users' module permissions
+
+Changes are committed first and then revoke the user's tokens: with
+AUTH_STATELESS the permissions signed into a token are trusted until it
+expires, so tokens issued before the change have to be rejected. Users
+cached by the API replicas are invalidated as well.
+
+    python -m app.db.users grant user1 module3
+    python -m app.db.users revoke user1 module1
+    python -m app.db.users revoke-tokens user1
+"""
+import argparse
+from typing import Iterable
+
+import redis
+from sqlalchemy import delete, select
+
+from app.core.permissions import invalidate_permissions
+from app.core.security import revoke_user_tokens
+from app.db.database import engine
+from app.db.models import Permission, User, user_permissions
+
+
+def permissions_changed(usernames: Iterable[str]) -> None:
+    """Revoke the tokens and cached permissions of users whose permissions changed"""
+    for username in usernames:
+        revoke_user_tokens(username)
+        invalidate_permissions(username)
+
+
+def set_permission(username: str, permission: str, granted: bool) -> bool:
+    """Grant or revoke a permission; returns whether anything changed"""
+    with engine.connect() as connection:
+        user_id = connection.execute(select(User.id).where(User.username == username)).scalar()
+        if user_id is None:
+            raise LookupError(f"Unknown user: {username}")
+        permission_id = connection.execute(select(Permission.id).where(Permission.name == permission)).scalar()
+        if permission_id is None:
+            raise LookupError(f"Unknown permission: {permission}")
+        grant = {"user_id": user_id, "permission_id": permission_id}
+        held = connection.execute(select(user_permissions).filter_by(**grant)).first() is not None
+        if held == granted:
+            return False
+        if granted:
+            connection.execute(user_permissions.insert().values(**grant))
+        else:
+            connection.execute(delete(user_permissions).filter_by(**grant))
+        connection.commit()
+    permissions_changed([username])
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help in (("grant", "grant a permission"), ("revoke", "revoke a permission")):
+        command = commands.add_parser(name, help=help)
+        command.add_argument("username")
+        command.add_argument("permission")
+    revoke_tokens = commands.add_parser("revoke-tokens", help="revoke every token issued to a user so far")
+    revoke_tokens.add_argument("username")
+    args = parser.parse_args()
+
+    if args.command == "revoke-tokens":
+        permissions_changed([args.username])
+        print(f"Tokens of {args.username} revoked")
+        return
+    granted = args.command == "grant"
+    try:
+        changed = set_permission(args.username, args.permission, granted)
+    except LookupError as e:
+        parser.error(str(e))
+    except redis.RedisError as e:
+        parser.exit(1, f"Permission updated, but revoking tokens failed ({e}): run revoke-tokens {args.username}\n")
+    if changed:
+        print(f"{'Granted' if granted else 'Revoked'} {args.permission} for {args.username}; tokens revoked")
+    else:
+        print(f"{args.username} {'already holds' if granted else 'does not hold'} {args.permission}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 from app.core.config import settings
+from app.core.celery_app import DEFAULT_QUEUE, MAX_PRIORITY, MIN_PRIORITY, MODULE_QUEUES
+from app.core.metrics import HTTP_REQUEST_DB_QUERIES, HTTP_REQUEST_DURATION, QueueDepthCollector, begin_request_query_count
+from app.core.permissions import listen_for_invalidations
 from app.api import auth, modules
-from app.db.init_db import init_db
+from app.db.init_db import check_schema_version
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -20,10 +27,48 @@ app.add_middleware(
 )
 
 
+# Queue depth is read from the broker when /metrics is scraped
+REGISTRY.register(QueueDepthCollector(
+    [DEFAULT_QUEUE] + sorted(set(MODULE_QUEUES.values())),
+    list(range(MIN_PRIORITY, MAX_PRIORITY + 1)),
+    ":"
+))
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record latency and DB query count per route"""
+    queries = begin_request_query_count()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_DURATION.labels(request.method, route_path, str(status_code)).observe(
+            time.perf_counter() - start
+        )
+        HTTP_REQUEST_DB_QUERIES.labels(route_path).observe(queries[0])
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
-    init_db()
+    """
+    Verify the schema and start background listeners
+    Migrations and seeding run once per deployment (python -m app.db.init_db)
+    """
+    await run_in_threadpool(check_schema_version)
+    app.state.permission_listener = asyncio.create_task(listen_for_invalidations())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background listeners"""
+    app.state.permission_listener.cancel()
 
 
 # Include routers
@@ -45,3 +90,10 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    data = await run_in_threadpool(generate_latest, REGISTRY)
+    return Response(content=data, media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,7 @@
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.db import models
 
 
@@ -9,12 +11,19 @@ class User:
         self.username = username
         self.hashed_password = hashed_password
         self.permissions = permissions
+        # Permission checks are set lookups
+        self.permission_set = frozenset(permissions)
         self.id = user_id
 
 
-def get_user(db: Session, username: str) -> User:
+async def get_user(db: AsyncSession, username: str) -> User:
     """Get user by username from database"""
-    db_user = db.query(models.User).filter(models.User.username == username).first()
+    result = await db.execute(
+        select(models.User)
+        .options(selectinload(models.User.permissions))
+        .where(models.User.username == username)
+    )
+    db_user = result.scalars().first()
     if not db_user:
         return None
     
@@ -28,7 +37,24 @@ def get_user(db: Session, username: str) -> User:
     )
 
 
-def get_user_id(db: Session, username: str) -> int:
+def get_user_from_claims(payload: dict) -> Optional[User]:
+    """
+    Build a user from verified JWT claims without touching the database
+    Returns None for tokens issued without the `uid` claim
+    """
+    username = payload.get("sub")
+    user_id = payload.get("uid")
+    if username is None or user_id is None:
+        return None
+    return User(
+        username=username,
+        hashed_password=None,
+        permissions=list(payload.get("permissions", [])),
+        user_id=user_id
+    )
+
+
+async def get_user_id(db: AsyncSession, username: str) -> int:
     """Get user ID by username from database"""
-    db_user = db.query(models.User).filter(models.User.username == username).first()
-    return db_user.id if db_user else None
+    result = await db.execute(select(models.User.id).where(models.User.username == username))
+    return result.scalar_one_or_none()
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, model_serializer
+from datetime import datetime
+from typing import Dict, List, Optional
 
 
 class Token(BaseModel):
@@ -28,8 +29,11 @@ class UserInfo(BaseModel):
 
 class TaskCreate(BaseModel):
     """Task creation schema"""
-    module_name: str
+    # Optional, the module is taken from the path; must match it if given
+    module_name: Optional[str] = None
     parameters: dict = {}
+    # Queue priority, 0 is the most urgent
+    priority: Optional[int] = Field(None, ge=0, le=9)
 
 
 class TaskStatus(BaseModel):
@@ -38,3 +42,122 @@ class TaskStatus(BaseModel):
     status: str
     result: Optional[dict] = None
     error: Optional[str] = None
+    # Counts reported by chunked scripts while running
+    progress: Optional[dict] = None
+
+
+class PartialResults(BaseModel):
+    """Slice of the partial results streamed by a task"""
+    task_id: str
+    offset: int
+    items: List[dict]
+    next_offset: int
+
+
+class TaskSummary(BaseModel):
+    """Task history entry; parameters and result only when requested"""
+    task_id: str
+    module_name: str
+    status: str
+    group_id: Optional[str] = None
+    workflow_id: Optional[str] = None
+    step_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    parameters: Optional[dict] = None
+    result: Optional[dict] = None
+
+
+class TaskPage(BaseModel):
+    """Page of task history"""
+    items: List[TaskSummary]
+    next_cursor: Optional[str] = None
+
+    @model_serializer(mode="wrap")
+    def keep_next_cursor(self, handler):
+        # The route drops unrequested item fields with exclude_none; the
+        # last page still reports next_cursor as null
+        data = handler(self)
+        data.setdefault("next_cursor", self.next_cursor)
+        return data
+
+
+class BatchTaskItem(BaseModel):
+    """Single module execution within a batch"""
+    module_name: str
+    parameters: dict = {}
+    # Queue priority, 0 is the most urgent
+    priority: Optional[int] = Field(None, ge=0, le=9)
+
+
+class BatchTaskCreate(BaseModel):
+    """Batch task creation schema"""
+    tasks: List[BatchTaskItem]
+
+
+class BatchTaskResponse(BaseModel):
+    """Batch task submission response schema"""
+    group_id: str
+    task_ids: List[str]
+    status: str
+    message: str
+
+
+class BatchStatus(BaseModel):
+    """Aggregate progress of a batch"""
+    group_id: str
+    total: int
+    completed: int
+    progress: float
+    counts: Dict[str, int]
+
+
+class WorkflowStep(BaseModel):
+    """Module execution within a workflow"""
+    step_id: str = Field(..., min_length=1, max_length=100, pattern=r"^[A-Za-z0-9_-]+$")
+    module_name: str
+    parameters: dict = {}
+    # Steps that must finish before this one starts
+    depends_on: List[str] = []
+    # Parameter name -> "<step_id>.<path>" into the result of an earlier step,
+    # e.g. {"drug_count": "cohort.anomalies_detected"}; implies depends_on
+    inputs: Dict[str, str] = {}
+    # Queue priority, 0 is the most urgent
+    priority: Optional[int] = Field(None, ge=0, le=9)
+
+
+class WorkflowCreate(BaseModel):
+    """Workflow submission schema: a DAG of module steps"""
+    steps: List[WorkflowStep]
+
+
+class WorkflowResponse(BaseModel):
+    """Workflow submission response schema"""
+    workflow_id: str
+    # step_id -> task_id
+    task_ids: Dict[str, str]
+    status: str
+    message: str
+
+
+class WorkflowStepStatus(BaseModel):
+    """State of one workflow step"""
+    step_id: str
+    task_id: str
+    module_name: str
+    status: str
+    error: Optional[str] = None
+    # Counts reported by chunked scripts while running
+    progress: Optional[dict] = None
+    result: Optional[dict] = None
+
+
+class WorkflowStatus(BaseModel):
+    """Overall and per-step progress of a workflow"""
+    workflow_id: str
+    status: str
+    total: int
+    completed: int
+    progress: float
+    steps: List[WorkflowStepStatus]
@@ -0,0 +1,118 @@
+"""
+Pluggable compute backends for the module scripts
+
+A backend implements the same kernels over columnar inputs:
+
+- module1: prepare_columns, column_moments, range_anomalies
+- module2: prepare_images, normalize_images, box_filter, image_statistics
+- module3: prepare_profiles, interaction_scores
+
+prepare_* convert plain lists to the backend's native representation, which
+the other kernels take and may return; final results are plain Python values.
+"python" is the reference implementation, "numpy" the vectorized one, and
+"crosscheck" runs both and fails on any disagreement.
+"""
+import math
+from typing import Optional
+
+from app.core.config import settings
+
+from app.scripts.engines.numpy_backend import NumpyBackend
+from app.scripts.engines.python_backend import PythonBackend
+
+
+class BackendMismatch(AssertionError):
+    """Two backends returned different results for the same kernel call"""
+
+
+def to_plain(value):
+    """Convert backend-native values (arrays, tuples) to comparable Python values"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    return value
+
+
+def results_match(a, b, rel_tol: float = 1e-7, abs_tol: float = 1e-9) -> bool:
+    """Structural equality, floats compared with a tolerance"""
+    a, b = to_plain(a), to_plain(b)
+    if isinstance(a, float) or isinstance(b, float):
+        if not isinstance(a, (int, float)) or not isinstance(b, (int, float)):
+            return False
+        if math.isinf(a) or math.isinf(b):
+            return a == b
+        return math.isclose(a, b, rel_tol=rel_tol, abs_tol=abs_tol)
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(
+            results_match(a[k], b[k], rel_tol, abs_tol) for k in a
+        )
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(
+            results_match(x, y, rel_tol, abs_tol) for x, y in zip(a, b)
+        )
+    return a == b
+
+
+class _Pair:
+    """Native data of both backends of a CrossCheckBackend"""
+    def __init__(self, primary, reference):
+        self.primary = primary
+        self.reference = reference
+
+
+class CrossCheckBackend:
+    """
+    Run every kernel on a primary and a reference backend and compare
+    Meant for validating a new backend on real workloads, not for production
+    throughput: the cost is the sum of both backends.
+    """
+    name = "crosscheck"
+
+    def __init__(self, primary, reference):
+        self.primary = primary
+        self.reference = reference
+
+    def __getattr__(self, kernel: str):
+        primary_kernel = getattr(self.primary, kernel)
+        reference_kernel = getattr(self.reference, kernel)
+
+        def run(*args, **kwargs):
+            primary_args = [a.primary if isinstance(a, _Pair) else a for a in args]
+            reference_args = [a.reference if isinstance(a, _Pair) else a for a in args]
+            primary_result = primary_kernel(*primary_args, **kwargs)
+            reference_result = reference_kernel(*reference_args, **kwargs)
+            if not results_match(primary_result, reference_result):
+                raise BackendMismatch(
+                    f"{self.primary.name} and {self.reference.name} disagree on {kernel}"
+                )
+            if kernel.startswith("prepare_") or hasattr(primary_result, "shape"):
+                return _Pair(primary_result, reference_result)
+            return primary_result
+        return run
+
+
+_backend = None
+
+
+def create_backend(name: str):
+    """Instantiate a backend by name: auto (numpy), numpy, python or crosscheck"""
+    if name == "python":
+        return PythonBackend()
+    if name in ("auto", "numpy"):
+        return NumpyBackend()
+    if name == "crosscheck":
+        return CrossCheckBackend(NumpyBackend(), PythonBackend())
+    raise ValueError(f"Unknown compute backend: {name}")
+
+
+def get_backend(name: Optional[str] = None):
+    """Get the process-wide backend configured by COMPUTE_BACKEND, or a named one"""
+    global _backend
+    if name is not None:
+        return create_backend(name)
+    if _backend is None:
+        _backend = create_backend(settings.COMPUTE_BACKEND)
+    return _backend
@@ -0,0 +1,59 @@
+"""
+Synthetic datasets for the module scripts and benchmarks
+Deterministic for a given random.Random state and backend-independent: plain
+lists, converted by each backend's prepare_* methods
+"""
+import random
+from typing import Dict, List, Tuple
+
+# Mean and standard deviation of each generated cohort column
+COHORT_DISTRIBUTIONS = {
+    "age": (52.0, 18.0),
+    "systolic_bp": (118.0, 12.0),
+    "diastolic_bp": (76.0, 8.0),
+    "heart_rate": (74.0, 10.0),
+    "glucose": (105.0, 22.0),
+}
+# Share of values replaced by an out-of-range spike
+COHORT_OUTLIER_RATE = 0.005
+
+ENZYME_COUNT = 8
+
+
+def synthetic_cohort(count: int, rng: random.Random) -> Dict[str, List[float]]:
+    """Columns of `count` patients' vitals"""
+    columns = {}
+    for name, (mean, std) in COHORT_DISTRIBUTIONS.items():
+        values = [rng.gauss(mean, std) for _ in range(count)]
+        for index in range(count):
+            if rng.random() < COHORT_OUTLIER_RATE:
+                values[index] = mean + rng.choice((-1, 1)) * 6 * std
+        columns[name] = values
+    return columns
+
+
+def synthetic_images(count: int, size: int, rng: random.Random) -> List[List[List[float]]]:
+    """`count` grayscale size x size images: background noise plus a few bright blobs"""
+    images = []
+    for _ in range(count):
+        image = [[rng.uniform(0, 400) for _ in range(size)] for _ in range(size)]
+        for _ in range(rng.randint(0, 3)):
+            cy, cx, radius = rng.randrange(size), rng.randrange(size), rng.randint(2, max(2, size // 6))
+            for y in range(max(0, cy - radius), min(size, cy + radius + 1)):
+                for x in range(max(0, cx - radius), min(size, cx + radius + 1)):
+                    image[y][x] += 1200
+        images.append(image)
+    return images
+
+
+def synthetic_drug_profiles(count: int, rng: random.Random) -> Tuple[List[List[float]], List[List[float]]]:
+    """
+    Enzyme profiles of `count` drugs as (inhibition, substrate) matrices
+    Row i, column k is the strength (0..1) with which drug i inhibits, or is
+    metabolized by, enzyme k
+    """
+    def sparse_row():
+        return [rng.random() if rng.random() < 0.25 else 0.0 for _ in range(ENZYME_COUNT)]
+    inhibits = [sparse_row() for _ in range(count)]
+    substrates = [sparse_row() for _ in range(count)]
+    return inhibits, substrates
@@ -0,0 +1,107 @@
+"""
+Vectorized NumPy backend
+Every kernel works on whole columns or whole image batches at once; there is
+no per-record Python loop. Results match PythonBackend up to floating-point
+rounding.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.scripts.engines.stats import Moments
+
+
+class NumpyBackend:
+    """Vectorized implementation of the compute kernels"""
+    name = "numpy"
+
+    # Module 1: cohort statistics and anomaly detection
+
+    def prepare_columns(self, columns: Dict[str, list]) -> Dict[str, np.ndarray]:
+        return {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+
+    def column_moments(self, columns: Dict[str, np.ndarray]) -> Dict[str, Moments]:
+        moments = {}
+        for name, values in columns.items():
+            if values.size == 0:
+                moments[name] = Moments(0, 0.0, 0.0, float("inf"), float("-inf"))
+                continue
+            mean = values.mean()
+            deviations = values - mean
+            moments[name] = Moments(
+                int(values.size), float(mean), float(deviations @ deviations),
+                float(values.min()), float(values.max())
+            )
+        return moments
+
+    def range_anomalies(
+        self,
+        columns: Dict[str, np.ndarray],
+        ranges: Dict[str, Tuple[float, float]]
+    ) -> Tuple[Dict[str, int], List[int]]:
+        per_column = {}
+        anomalous = None
+        for name, (low, high) in ranges.items():
+            values = columns[name]
+            mask = (values < low) | (values > high)
+            per_column[name] = int(np.count_nonzero(mask))
+            anomalous = mask if anomalous is None else anomalous | mask
+        rows = np.flatnonzero(anomalous).tolist() if anomalous is not None else []
+        return per_column, rows
+
+    # Module 2: image normalization and filtering
+
+    def prepare_images(self, images) -> np.ndarray:
+        """Batch of images as one (count, height, width) array"""
+        return np.asarray(images, dtype=np.float64)
+
+    def normalize_images(self, images: np.ndarray) -> np.ndarray:
+        """Scale each image to [0, 1]; constant images become all zeros"""
+        low = images.min(axis=(1, 2), keepdims=True)
+        span = images.max(axis=(1, 2), keepdims=True) - low
+        scale = np.divide(1.0, span, out=np.zeros_like(span), where=span > 0)
+        return (images - low) * scale
+
+    def box_filter(self, images: np.ndarray, size: int) -> np.ndarray:
+        """Mean over a size x size window (size odd), edges replicated"""
+        radius = size // 2
+        padded = np.pad(images, ((0, 0), (radius, radius), (radius, radius)), mode="edge")
+        # Integral image with a leading row and column of zeros
+        integral = np.zeros((padded.shape[0], padded.shape[1] + 1, padded.shape[2] + 1))
+        np.cumsum(np.cumsum(padded, axis=1), axis=2, out=integral[:, 1:, 1:])
+        height, width = images.shape[1], images.shape[2]
+        window = (
+            integral[:, size:size + height, size:size + width]
+            - integral[:, :height, size:size + width]
+            - integral[:, size:size + height, :width]
+            + integral[:, :height, :width]
+        )
+        return window / (size * size)
+
+    def image_statistics(self, images: np.ndarray, threshold: float) -> List[dict]:
+        flat = images.reshape(images.shape[0], -1)
+        means = flat.mean(axis=1)
+        stds = flat.std(axis=1)
+        bright = np.count_nonzero(flat >= threshold, axis=1) / flat.shape[1]
+        return [
+            {"mean": float(m), "std": float(s), "bright_fraction": float(b)}
+            for m, s, b in zip(means, stds, bright)
+        ]
+
+    # Module 3: pairwise interaction scoring
+
+    def prepare_profiles(self, inhibits, substrates):
+        return np.asarray(inhibits, dtype=np.float64), np.asarray(substrates, dtype=np.float64)
+
+    def interaction_scores(self, profiles, threshold: float) -> List[Tuple[int, int, float]]:
+        """
+        Pairs (i, j), i < j, scoring at least `threshold`
+        All pair scores come from one matrix product
+        """
+        inhibits, substrates = profiles
+        directed = inhibits @ substrates.T
+        scores = directed + directed.T
+        rows, cols = np.triu_indices(scores.shape[0], k=1)
+        pair_scores = scores[rows, cols]
+        keep = pair_scores >= threshold
+        return list(zip(rows[keep].tolist(), cols[keep].tolist(), pair_scores[keep].tolist()))
@@ -0,0 +1,127 @@
+"""
+Pure-Python reference backend
+Straightforward loops, kept as the specification the vectorized backends are
+cross-checked against and as the fallback when NumPy is not installed
+"""
+import math
+from typing import Dict, List, Tuple
+
+from app.scripts.engines.stats import Moments
+
+
+class PythonBackend:
+    """Reference implementation of the compute kernels"""
+    name = "python"
+
+    # Module 1: cohort statistics and anomaly detection
+
+    def prepare_columns(self, columns: Dict[str, list]) -> Dict[str, List[float]]:
+        return {name: [float(v) for v in values] for name, values in columns.items()}
+
+    def column_moments(self, columns: Dict[str, List[float]]) -> Dict[str, Moments]:
+        moments = {}
+        for name, values in columns.items():
+            count = len(values)
+            if count == 0:
+                moments[name] = Moments(0, 0.0, 0.0, math.inf, -math.inf)
+                continue
+            mean = sum(values) / count
+            m2 = sum((v - mean) * (v - mean) for v in values)
+            moments[name] = Moments(count, mean, m2, min(values), max(values))
+        return moments
+
+    def range_anomalies(
+        self,
+        columns: Dict[str, List[float]],
+        ranges: Dict[str, Tuple[float, float]]
+    ) -> Tuple[Dict[str, int], List[int]]:
+        per_column = {}
+        anomalous = set()
+        for name, (low, high) in ranges.items():
+            count = 0
+            for row, value in enumerate(columns[name]):
+                if value < low or value > high:
+                    count += 1
+                    anomalous.add(row)
+            per_column[name] = count
+        return per_column, sorted(anomalous)
+
+    # Module 2: image normalization and filtering
+
+    def prepare_images(self, images) -> List[List[List[float]]]:
+        return [[[float(v) for v in row] for row in image] for image in images]
+
+    def normalize_images(self, images: List[List[List[float]]]) -> List[List[List[float]]]:
+        """Scale each image to [0, 1]; constant images become all zeros"""
+        normalized = []
+        for image in images:
+            low = min(min(row) for row in image)
+            high = max(max(row) for row in image)
+            scale = 1.0 / (high - low) if high > low else 0.0
+            normalized.append([[(v - low) * scale for v in row] for row in image])
+        return normalized
+
+    def box_filter(self, images: List[List[List[float]]], size: int) -> List[List[List[float]]]:
+        """Mean over a size x size window (size odd), edges replicated"""
+        radius = size // 2
+        filtered = []
+        for image in images:
+            height, width = len(image), len(image[0])
+            # Integral image of the edge-padded image
+            padded_width = width + 2 * radius
+            integral = [[0.0] * (padded_width + 1)]
+            for y in range(-radius, height + radius):
+                row = image[min(max(y, 0), height - 1)]
+                acc = 0.0
+                line = [0.0]
+                above = integral[-1]
+                for x in range(-radius, width + radius):
+                    acc += row[min(max(x, 0), width - 1)]
+                    line.append(above[len(line)] + acc)
+                integral.append(line)
+            area = size * size
+            out = []
+            for y in range(height):
+                top, bottom = integral[y], integral[y + size]
+                out.append([
+                    (bottom[x + size] - bottom[x] - top[x + size] + top[x]) / area
+                    for x in range(width)
+                ])
+            filtered.append(out)
+        return filtered
+
+    def image_statistics(self, images: List[List[List[float]]], threshold: float) -> List[dict]:
+        stats = []
+        for image in images:
+            values = [v for row in image for v in row]
+            count = len(values)
+            mean = sum(values) / count
+            variance = sum((v - mean) * (v - mean) for v in values) / count
+            bright = sum(1 for v in values if v >= threshold)
+            stats.append({"mean": mean, "std": math.sqrt(variance), "bright_fraction": bright / count})
+        return stats
+
+    # Module 3: pairwise interaction scoring
+
+    def prepare_profiles(self, inhibits, substrates):
+        return (
+            [[float(v) for v in row] for row in inhibits],
+            [[float(v) for v in row] for row in substrates],
+        )
+
+    def interaction_scores(self, profiles, threshold: float) -> List[Tuple[int, int, float]]:
+        """
+        Pairs (i, j), i < j, scoring at least `threshold`
+        score = sum over enzymes of inhibits[i] * substrate[j] + inhibits[j] * substrate[i]
+        """
+        inhibits, substrates = profiles
+        count = len(inhibits)
+        pairs = []
+        for i in range(count):
+            for j in range(i + 1, count):
+                score = 0.0
+                for a, b, c, d in zip(inhibits[i], substrates[j], inhibits[j], substrates[i]):
+                    score += a * b + c * d
+                if score >= threshold:
+                    pairs.append((i, j, score))
+        return pairs
@@ -0,0 +1,73 @@
+"""
+Backend-independent pieces of the compute kernels
+Mergeable moments for chunked cohort statistics, reference ranges and the
+score thresholds shared by every backend
+"""
+import math
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# Cohort columns and their clinical reference ranges (inclusive); values
+# outside are flagged as anomalies
+VITAL_REFERENCE_RANGES: Dict[str, Tuple[float, float]] = {
+    "age": (0.0, 110.0),
+    "systolic_bp": (90.0, 140.0),
+    "diastolic_bp": (60.0, 90.0),
+    "heart_rate": (50.0, 110.0),
+    "glucose": (70.0, 180.0),
+}
+
+# Fraction of bright pixels (after normalization and filtering) above which
+# an image is suggested for review, and the brightness threshold itself
+BRIGHT_PIXEL_THRESHOLD = 0.8
+DIAGNOSIS_LEVELS = [(0.05, "Normal"), (0.15, "Requires attention"), (math.inf, "Urgent")]
+
+# Pairwise interaction scores at or above this are reported
+INTERACTION_THRESHOLD = 1.0
+RISK_LEVELS = [(1.5, "low"), (2.5, "moderate"), (math.inf, "high")]
+
+
+class Moments(NamedTuple):
+    """Count, mean, sum of squared deviations, min and max of a column"""
+    count: int
+    mean: float
+    m2: float
+    minimum: float
+    maximum: float
+
+
+def merge_moments(a: Optional[Moments], b: Moments) -> Moments:
+    """Combine the moments of two disjoint chunks (Chan et al.)"""
+    if a is None or a.count == 0:
+        return b
+    if b.count == 0:
+        return a
+    count = a.count + b.count
+    delta = b.mean - a.mean
+    return Moments(
+        count=count,
+        mean=a.mean + delta * b.count / count,
+        m2=a.m2 + b.m2 + delta * delta * a.count * b.count / count,
+        minimum=min(a.minimum, b.minimum),
+        maximum=max(a.maximum, b.maximum),
+    )
+
+
+def summarize_moments(moments: Moments) -> dict:
+    """Count, mean, population standard deviation, min and max"""
+    if moments.count == 0:
+        return {"count": 0, "mean": None, "std": None, "min": None, "max": None}
+    return {
+        "count": moments.count,
+        "mean": moments.mean,
+        "std": math.sqrt(moments.m2 / moments.count),
+        "min": moments.minimum,
+        "max": moments.maximum,
+    }
+
+
+def classify(value: float, levels) -> str:
+    """Label of the first (upper bound, label) level that `value` is below"""
+    for bound, label in levels:
+        if value < bound:
+            return label
+    return levels[-1][1]
@@ -0,0 +1,230 @@
+"""
+Drug-interaction index for module3
+
+The knowledge base is a CSV of known interactions (drug_a,drug_b,score). It
+is compiled once per version into a CSR adjacency structure: drug names are
+interned to integers in sorted order, and each drug's row lists its
+interacting drugs (sorted) and the scores. The arrays are stored as .npy
+files and memory-mapped read-only, so every worker process on a host shares
+one copy through the page cache.
+
+Index directories are named by the knowledge base content hash and are
+published with an atomic rename. Workers notice a changed knowledge base
+file and swap to the new index without a restart; lookups in flight keep
+using the old one.
+
+    python -m app.scripts.interaction_index build
+    python -m app.scripts.interaction_index sample --drugs 2000 --output interactions.csv
+"""
+import argparse
+import csv
+import fcntl
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def knowledge_base_version(path: str) -> str:
+    """Content hash identifying a knowledge base file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def read_knowledge_base(path: str) -> Tuple[List[str], List[str], List[float]]:
+    """Columns of a drug_a,drug_b,score CSV; self-interactions are dropped"""
+    drugs_a, drugs_b, scores = [], [], []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            a, b = row["drug_a"].strip(), row["drug_b"].strip()
+            if a and b and a != b:
+                drugs_a.append(a)
+                drugs_b.append(b)
+                scores.append(float(row["score"]))
+    return drugs_a, drugs_b, scores
+
+
+def build_index_files(kb_path: str, target_dir: str) -> None:
+    """Compile a knowledge base into the CSR files of an index directory"""
+    drugs_a, drugs_b, pair_scores = read_knowledge_base(kb_path)
+    drugs = sorted(set(drugs_a) | set(drugs_b))
+    ids = {name: i for i, name in enumerate(drugs)}
+    a = np.fromiter((ids[name] for name in drugs_a), dtype=np.int64, count=len(drugs_a))
+    b = np.fromiter((ids[name] for name in drugs_b), dtype=np.int64, count=len(drugs_b))
+    scores = np.asarray(pair_scores, dtype=np.float64)
+
+    # Store both directions, so each drug's row holds all its interactions
+    rows = np.concatenate([a, b])
+    cols = np.concatenate([b, a])
+    scores = np.concatenate([scores, scores])
+    # Sort by (row, col, -score) and keep the highest score of duplicate pairs
+    order = np.lexsort((-scores, cols, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    rows, cols, scores = rows[first], cols[first], scores[first]
+
+    indptr = np.zeros(len(drugs) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(drugs)), out=indptr[1:])
+    np.save(os.path.join(target_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(target_dir, "indices.npy"), cols.astype(np.int32))
+    np.save(os.path.join(target_dir, "scores.npy"), scores)
+    with open(os.path.join(target_dir, "drugs.json"), "w") as f:
+        json.dump(drugs, f)
+
+
+def ensure_index(kb_path: str, index_root: str, version: Optional[str] = None) -> str:
+    """
+    Path of the index of a knowledge base version, building it if needed
+    Builds are serialized by a file lock; the finished directory appears
+    atomically, so readers never see a partial index
+    """
+    version = version or knowledge_base_version(kb_path)
+    index_dir = os.path.join(index_root, version)
+    if os.path.isdir(index_dir):
+        return index_dir
+
+    os.makedirs(index_root, exist_ok=True)
+    with open(os.path.join(index_root, ".build.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.isdir(index_dir):
+            return index_dir
+        tmp_dir = tempfile.mkdtemp(dir=index_root, prefix=".tmp-")
+        try:
+            build_index_files(kb_path, tmp_dir)
+            os.chmod(tmp_dir, 0o755)
+            os.rename(tmp_dir, index_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+    return index_dir
+
+
+class InteractionIndex:
+    """Read-only, memory-mapped CSR interaction index"""
+    def __init__(self, index_dir: str):
+        self.version = os.path.basename(index_dir.rstrip(os.sep))
+        with open(os.path.join(index_dir, "drugs.json")) as f:
+            self.drugs: List[str] = json.load(f)
+        self.drug_ids: Dict[str, int] = {name: i for i, name in enumerate(self.drugs)}
+        self.indptr = np.load(os.path.join(index_dir, "indptr.npy"), mmap_mode="r")
+        self.indices = np.load(os.path.join(index_dir, "indices.npy"), mmap_mode="r")
+        self.scores = np.load(os.path.join(index_dir, "scores.npy"), mmap_mode="r")
+
+    def interactions_among(self, medications: Sequence[str]) -> Tuple[List[Tuple[str, str, float]], List[str]]:
+        """
+        Known interactions between the drugs of a medication list
+        Returns ((drug_a, drug_b, score) pairs, unknown drug names). Cost is
+        O(k log k + sum of the listed drugs' degrees) for k medications, no
+        pairwise scan.
+        """
+        unknown = sorted({name for name in medications if name not in self.drug_ids})
+        ids = np.unique(np.fromiter(
+            (self.drug_ids[name] for name in medications if name in self.drug_ids), dtype=np.int64
+        ))
+        if len(ids) < 2:
+            return [], unknown
+
+        starts = self.indptr[ids]
+        lengths = self.indptr[ids + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return [], unknown
+        # Positions of every neighbor of every listed drug, gathered in one go
+        row_offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        positions = row_offsets + np.arange(total)
+        sources = np.repeat(ids, lengths)
+        neighbors = self.indices[positions].astype(np.int64)
+        # Keep neighbors that are listed too, each pair once (source < neighbor)
+        slot = np.minimum(np.searchsorted(ids, neighbors), len(ids) - 1)
+        hit = (ids[slot] == neighbors) & (sources < neighbors)
+        pairs = [
+            (self.drugs[a], self.drugs[b], score)
+            for a, b, score in zip(sources[hit].tolist(), neighbors[hit].tolist(), self.scores[positions[hit]].tolist())
+        ]
+        return pairs, unknown
+
+
+_index: Optional[InteractionIndex] = None
+_kb_stat = None
+_checked_at = 0.0
+
+
+def get_interaction_index() -> InteractionIndex:
+    """
+    Get the index of the current knowledge base (DRUG_KB_PATH)
+    The knowledge base file is checked for changes at most every
+    DRUG_INDEX_CHECK_SECONDS; a new version is built or opened and swapped in
+    """
+    global _index, _kb_stat, _checked_at
+    if not settings.DRUG_KB_PATH:
+        raise RuntimeError("DRUG_KB_PATH is not configured")
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < settings.DRUG_INDEX_CHECK_SECONDS:
+        return _index
+    _checked_at = now
+
+    stat = os.stat(settings.DRUG_KB_PATH)
+    file_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    if _index is None or file_key != _kb_stat:
+        version = knowledge_base_version(settings.DRUG_KB_PATH)
+        if _index is None or _index.version != version:
+            _index = InteractionIndex(ensure_index(settings.DRUG_KB_PATH, settings.DRUG_INDEX_DIR, version))
+        _kb_stat = file_key
+    return _index
+
+
+def write_sample_knowledge_base(path: str, drug_count: int, seed: int = 0) -> int:
+    """Write a synthetic knowledge base from random enzyme profiles, return the pair count"""
+    from app.scripts.engines import create_backend
+    from app.scripts.engines.datasets import synthetic_drug_profiles
+    from app.scripts.engines.stats import INTERACTION_THRESHOLD
+
+    backend = create_backend("auto")
+    profiles = backend.prepare_profiles(*synthetic_drug_profiles(drug_count, random.Random(seed)))
+    pairs = backend.interaction_scores(profiles, INTERACTION_THRESHOLD)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["drug_a", "drug_b", "score"])
+        for i, j, score in pairs:
+            writer.writerow([f"drug-{i:03d}", f"drug-{j:03d}", round(score, 6)])
+    os.replace(tmp_path, path)
+    return len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build the index of the knowledge base")
+    build.add_argument("--kb", default=settings.DRUG_KB_PATH)
+    build.add_argument("--index-dir", default=settings.DRUG_INDEX_DIR)
+    sample = commands.add_parser("sample", help="write a synthetic knowledge base")
+    sample.add_argument("--drugs", type=int, default=2000)
+    sample.add_argument("--seed", type=int, default=0)
+    sample.add_argument("--output", default=settings.DRUG_KB_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if not args.kb:
+            parser.error("no knowledge base: set DRUG_KB_PATH or pass --kb")
+        print(ensure_index(args.kb, args.index_dir))
+    else:
+        if not args.output:
+            parser.error("no output path: set DRUG_KB_PATH or pass --output")
+        print(f"{write_sample_knowledge_base(args.output, args.drugs, args.seed)} interactions written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,354 @@
 """
 Medical data processing scripts
-These are simulated scripts that represent actual medical data processing logic
+The analyses run on the configured compute backend (app.scripts.engines)
+over synthetic inputs generated from the `seed` parameter; a real deployment
+replaces the dataset generators with its data sources. module2 also reads
+image volumes from disk (app.scripts.volume_io)
+
+Scripts are registered in app.scripts.registry, which also runs them. A
+script takes the validated task parameters and is either
+- a plain function returning the result dict, or
+- a generator function that processes its input in chunks, yields a progress
+  update after each chunk and returns the result dict. A progress update is
+  {"processed": int, "total": int, "partial": optional dict}; partial results
+  are streamed to the result store instead of being kept in memory. A
+  generator script may catch SoftTimeLimitExceeded, raised at its `yield`
+  or inside a chunk, and return a result with status "partial".
 """
+import hashlib
+import json
+import os
 import time
 import random
 
+import numpy as np
+from celery.exceptions import SoftTimeLimitExceeded
+
+from app.core.config import settings
+from app.scripts.engines import get_backend
+from app.scripts.engines.datasets import synthetic_cohort, synthetic_drug_profiles, synthetic_images
+from app.scripts.engines.stats import (
+    BRIGHT_PIXEL_THRESHOLD, DIAGNOSIS_LEVELS, INTERACTION_THRESHOLD, RISK_LEVELS,
+    VITAL_REFERENCE_RANGES, classify, merge_moments, summarize_moments
+)
+from app.scripts.parallel import SharedArrays, pool_pids
+from app.scripts.volume_io import (
+    SlabWriter, iter_slabs, open_volume, peak_rss_bytes, reset_peak_rss, resolve_data_path
+)
 
-def module1_script(parameters: dict) -> dict:
+# Anomalous patients listed per partial result, the rest are only counted
+MAX_LISTED_ANOMALIES = 100
+# Interactions listed in the module3 result, strongest first
+MAX_LISTED_INTERACTIONS = 50
+
+RISK_RECOMMENDATIONS = {
+    "none": [],
+    "low": ["Monitor patient"],
+    "moderate": ["Monitor patient", "Adjust dosage"],
+    "high": ["Review prescription", "Consider alternative drugs"],
+}
+
+
+def module1_script(parameters: dict):
     """
-    Simulate Module 1: Patient Data Analysis
-    This would normally process patient data and generate reports
+    Module 1: Patient Data Analysis
+    Cohort statistics and reference-range anomaly detection over the vitals
+    Processes the cohort in chunks of `chunk_size` patients
     """
     print(f"Module 1 script started with parameters: {parameters}")
-    
-    # Simulate processing time
-    time.sleep(random.uniform(2, 5))
-    
-    # Simulate results
+
+    backend = get_backend()
+    rng = random.Random(parameters.get("seed", 0))
+    total = int(parameters.get("patient_count", 150))
+    chunk_size = max(1, int(parameters.get("chunk_size", 50)))
+    moments = {}
+    anomalies_by_measure = {name: 0 for name in VITAL_REFERENCE_RANGES}
+    anomalies_detected = 0
+    processed = 0
+
+    try:
+        for start in range(0, total, chunk_size):
+            chunk = min(chunk_size, total - start)
+            cohort = synthetic_cohort(chunk, rng)
+            with SharedArrays({name: np.asarray(values, dtype=np.float64) for name, values in cohort.items()}) as shared:
+                parts = shared.map(cohort_part, chunk)
+            rows = []
+            for part_moments, per_measure, part_rows in parts:
+                for name, part in part_moments.items():
+                    moments[name] = merge_moments(moments.get(name), part)
+                for name, count in per_measure.items():
+                    anomalies_by_measure[name] += count
+                rows.extend(part_rows)
+            anomalies_detected += len(rows)
+            processed = start + chunk
+            yield {
+                "processed": processed,
+                "total": total,
+                "partial": {
+                    "first_patient": start,
+                    "patients": chunk,
+                    "anomalies_detected": len(rows),
+                    "anomalous_patients": [start + row for row in rows[:MAX_LISTED_ANOMALIES]]
+                }
+            }
+    except SoftTimeLimitExceeded:
+        # Out of time: report the chunks processed so far
+        pass
+
     result = {
         "module": "module1",
-        "status": "completed",
-        "patients_processed": 150,
-        "anomalies_detected": 3,
+        "status": "completed" if processed == total else "partial",
+        "patients_processed": processed,
+        "anomalies_detected": anomalies_detected,
+        "anomalies_by_measure": anomalies_by_measure,
+        "cohort_statistics": {name: summarize_moments(m) for name, m in moments.items()},
+        "compute_backend": backend.name,
         "report_path": "/reports/module1_report.pdf",
         "timestamp": time.time()
     }
-    
+
     print(f"Module 1 script completed: {result}")
     return result
 
 
-def module2_script(parameters: dict) -> dict:
+def cohort_part(arrays: dict, start: int, stop: int):
+    """Moments and anomalies of patients [start, stop) of a chunk"""
+    backend = get_backend()
+    columns = backend.prepare_columns({name: values[start:stop] for name, values in arrays.items()})
+    per_measure, rows = backend.range_anomalies(columns, VITAL_REFERENCE_RANGES)
+    return backend.column_moments(columns), per_measure, [start + row for row in rows]
+
+
+def image_part(arrays: dict, start: int, stop: int, filter_size: int) -> list:
     """
-    Simulate Module 2: Medical Image Processing
-    This would normally process medical images (X-rays, MRI, CT scans)
+    Normalize, filter and summarize images [start, stop) of a batch
+    The filtered images are stored in the "filtered" array if there is one
+    """
+    backend = get_backend()
+    images = backend.normalize_images(backend.prepare_images(arrays["images"][start:stop]))
+    filtered = backend.box_filter(images, filter_size)
+    if "filtered" in arrays:
+        # The crosscheck backend wraps both results, store the primary one
+        arrays["filtered"][start:stop] = getattr(filtered, "primary", filtered)
+    return backend.image_statistics(filtered, BRIGHT_PIXEL_THRESHOLD)
+
+
+def module2_script(parameters: dict):
+    """
+    Module 2: Medical Image Processing
+    Normalizes each image to [0, 1], smooths it with a box filter and flags
+    images with a large share of bright pixels
+    Processes the image set in batches of `chunk_size` images, or the slices
+    of the volume at `volume_path` in slabs of `chunk_size` slices
     """
     print(f"Module 2 script started with parameters: {parameters}")
-    
-    # Simulate processing time
-    time.sleep(random.uniform(3, 7))
-    
-    # Simulate results
+
+    reset_peak_rss(pool_pids())
+    if parameters.get("volume_path"):
+        result = yield from process_volume(parameters)
+        print(f"Module 2 script completed: {result}")
+        return result
+
+    backend = get_backend()
+    rng = random.Random(parameters.get("seed", 0))
+    total = int(parameters.get("image_count", 45))
+    chunk_size = max(1, int(parameters.get("chunk_size", 15)))
+    image_size = int(parameters.get("image_size", 64))
+    filter_size = int(parameters.get("filter_size", 3))
+    diagnosis_counts = {label: 0 for _, label in DIAGNOSIS_LEVELS}
+    intensity_sum = 0.0
+    processed = 0
+
+    try:
+        for start in range(0, total, chunk_size):
+            chunk = min(chunk_size, total - start)
+            images = np.asarray(synthetic_images(chunk, image_size, rng), dtype=np.float64)
+            with SharedArrays({"images": images}) as shared:
+                stats = [s for part in shared.map(image_part, chunk, filter_size) for s in part]
+            suggestions = [classify(s["bright_fraction"], DIAGNOSIS_LEVELS) for s in stats]
+            for suggestion in suggestions:
+                diagnosis_counts[suggestion] += 1
+            intensity_sum += sum(s["mean"] for s in stats)
+            processed = start + chunk
+            yield {
+                "processed": processed,
+                "total": total,
+                "partial": {
+                    "first_image": start,
+                    "images": chunk,
+                    "diagnosis_suggestions": suggestions,
+                    "bright_fractions": [s["bright_fraction"] for s in stats]
+                }
+            }
+    except SoftTimeLimitExceeded:
+        # Out of time: report the batches processed so far
+        pass
+
     result = {
         "module": "module2",
-        "status": "completed",
-        "images_processed": 45,
-        "diagnosis_suggestions": ["Normal", "Requires attention", "Urgent"],
-        "accuracy": 0.95,
+        "status": "completed" if processed == total else "partial",
+        "images_processed": processed,
+        "diagnosis_suggestions": [label for _, label in DIAGNOSIS_LEVELS],
+        "diagnosis_counts": diagnosis_counts,
+        "mean_intensity": intensity_sum / processed if processed else None,
+        "compute_backend": backend.name,
+        "peak_rss_bytes": peak_rss_bytes(pool_pids()),
         "timestamp": time.time()
     }
-    
+
     print(f"Module 2 script completed: {result}")
     return result
 
 
+def process_volume(parameters: dict):
+    """
+    Module 2 on a memory-mapped volume
+    Only one slab of slices is held in memory at a time; the filtered volume
+    is written slab by slab to IMAGE_OUTPUT_DIR, named by the input and the
+    filter parameters
+    """
+    backend = get_backend()
+    volume = open_volume(
+        resolve_data_path(settings.IMAGE_INPUT_DIR, parameters["volume_path"]),
+        parameters.get("raw_shape"), parameters.get("raw_dtype", "uint16")
+    )
+    total = len(volume)
+    chunk_size = max(1, int(parameters.get("chunk_size", 15)))
+    filter_size = int(parameters.get("filter_size", 3))
+    output_key = json.dumps([parameters["volume_path"], filter_size, backend.name])
+    output_name = f"module2/{hashlib.sha256(output_key.encode()).hexdigest()[:16]}.npy"
+    writer = SlabWriter(resolve_data_path(settings.IMAGE_OUTPUT_DIR, output_name), volume.shape)
+    diagnosis_counts = {label: 0 for _, label in DIAGNOSIS_LEVELS}
+    intensity_sum = 0.0
+    processed = 0
+    completed = False
+
+    try:
+        for start, slab in iter_slabs(volume, chunk_size):
+            with SharedArrays({"images": slab}, outputs={"filtered": (slab.shape, np.float32)}) as shared:
+                stats = [s for part in shared.map(image_part, len(slab), filter_size) for s in part]
+                writer.write(start, shared["filtered"])
+            suggestions = [classify(s["bright_fraction"], DIAGNOSIS_LEVELS) for s in stats]
+            for suggestion in suggestions:
+                diagnosis_counts[suggestion] += 1
+            intensity_sum += sum(s["mean"] for s in stats)
+            processed = start + len(slab)
+            yield {
+                "processed": processed,
+                "total": total,
+                "partial": {
+                    "first_slice": start,
+                    "slices": len(slab),
+                    "diagnosis_suggestions": suggestions,
+                    "bright_fractions": [s["bright_fraction"] for s in stats]
+                }
+            }
+        writer.commit()
+        completed = True
+    except SoftTimeLimitExceeded:
+        # Out of time: report the slabs processed so far, without an output volume
+        writer.abort()
+    except BaseException:
+        writer.abort()
+        raise
+
+    return {
+        "module": "module2",
+        "status": "completed" if completed else "partial",
+        "images_processed": processed,
+        "volume_shape": list(volume.shape),
+        "output_path": output_name if completed else None,
+        "diagnosis_suggestions": [label for _, label in DIAGNOSIS_LEVELS],
+        "diagnosis_counts": diagnosis_counts,
+        "mean_intensity": intensity_sum / processed if processed else None,
+        "compute_backend": backend.name,
+        "peak_rss_bytes": peak_rss_bytes(pool_pids()),
+        "timestamp": time.time()
+    }
+
+
+def module2_input_version(parameters: dict):
+    """Identity of the input volume file, so a replaced volume is not served from the result cache"""
+    if not parameters.get("volume_path"):
+        return None
+    stat = os.stat(resolve_data_path(settings.IMAGE_INPUT_DIR, parameters["volume_path"]))
+    return f"{stat.st_size}-{stat.st_mtime_ns}-{stat.st_ino}"
+
+
 def module3_script(parameters: dict) -> dict:
     """
-    Simulate Module 3: Drug Interaction Analysis
-    This would normally analyze drug interactions and provide recommendations
+    Module 3: Drug Interaction Analysis
+    Looks up the interactions within a medication list in the knowledge base
+    index or, without a list, scores every pair of synthetic drugs by
+    enzyme-mediated interaction strength: how much each drug inhibits the
+    enzymes that metabolize the other
     """
     print(f"Module 3 script started with parameters: {parameters}")
-    
-    # Simulate processing time
-    time.sleep(random.uniform(2, 6))
-    
-    # Simulate results
+
+    if parameters.get("medications") is not None:
+        return check_medication_list(parameters["medications"])
+
+    backend = get_backend()
+    rng = random.Random(parameters.get("seed", 0))
+    drug_count = int(parameters.get("drug_count", 28))
+    profiles = backend.prepare_profiles(*synthetic_drug_profiles(drug_count, rng))
+    pairs = backend.interaction_scores(profiles, INTERACTION_THRESHOLD)
+    pairs.sort(key=lambda pair: (-pair[2], pair[0], pair[1]))
+
+    max_score = pairs[0][2] if pairs else 0.0
+    risk_level = classify(max_score, RISK_LEVELS) if pairs else "none"
     result = {
         "module": "module3",
         "status": "completed",
-        "drugs_analyzed": 28,
-        "interactions_found": 5,
-        "risk_level": "moderate",
-        "recommendations": ["Monitor patient", "Adjust dosage"],
+        "drugs_analyzed": drug_count,
+        "interactions_found": len(pairs),
+        "interactions": [
+            {"drug_a": f"drug-{i:03d}", "drug_b": f"drug-{j:03d}", "score": score}
+            for i, j, score in pairs[:MAX_LISTED_INTERACTIONS]
+        ],
+        "risk_level": risk_level,
+        "recommendations": RISK_RECOMMENDATIONS[risk_level],
+        "compute_backend": backend.name,
         "timestamp": time.time()
     }
-    
+
     print(f"Module 3 script completed: {result}")
     return result
 
 
-# Script registry
-SCRIPT_REGISTRY = {
-    "module1": module1_script,
-    "module2": module2_script,
-    "module3": module3_script,
-}
+def check_medication_list(medications: list) -> dict:
+    """Module 3 on a medication list, using the precomputed interaction index"""
+    # Imported on first use: only module3 workers open the index
+    from app.scripts.interaction_index import get_interaction_index
+
+    index = get_interaction_index()
+    pairs, unknown = index.interactions_among(medications)
+    pairs.sort(key=lambda pair: (-pair[2], pair[0], pair[1]))
+
+    risk_level = classify(pairs[0][2], RISK_LEVELS) if pairs else "none"
+    result = {
+        "module": "module3",
+        "status": "completed",
+        "drugs_analyzed": len(set(medications)),
+        "unknown_drugs": unknown,
+        "interactions_found": len(pairs),
+        "interactions": [
+            {"drug_a": a, "drug_b": b, "score": score}
+            for a, b, score in pairs[:MAX_LISTED_INTERACTIONS]
+        ],
+        "risk_level": risk_level,
+        "recommendations": RISK_RECOMMENDATIONS[risk_level],
+        "knowledge_base_version": index.version,
+        "timestamp": time.time()
+    }
+
+    print(f"Module 3 script completed: {result}")
+    return result
 
 
-def get_script(module_name: str):
-    """Get script function by module name"""
-    return SCRIPT_REGISTRY.get(module_name)
+def module3_input_version(parameters: dict):
+    """Version of the knowledge base a medication list is checked against"""
+    if parameters.get("medications") is None:
+        return None
+    from app.scripts.interaction_index import get_interaction_index
+    return get_interaction_index().version
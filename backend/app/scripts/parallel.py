@@ -0,0 +1,220 @@
+"""
+In-task data parallelism for the module scripts
+
+A script places the arrays of a chunk in SharedArrays and maps a part
+function over row ranges of it. With a parallelism above 1 the arrays live
+in shared memory (multiprocessing.shared_memory) and the parts run on a
+persistent process pool of the worker process; pool processes attach to the
+arrays by name, so inputs are never pickled and outputs are written in
+place. Otherwise the parts run inline on ordinary arrays.
+
+The parallelism of a task is set by execute_medical_script from the module's
+max_parallelism (registry, overridable with MODULE_MAX_PARALLELISM), capped
+by the pool size SCRIPT_POOL_PROCESSES. By default the CPUs are shared out
+among the worker's processes, so each gets cpu_count // concurrency.
+
+Cancellation: the parts already running cannot be interrupted, so a soft time
+limit or a revoke with terminate (SIGTERM) during a map terminates the pool
+and unlinks the shared memory before the interruption proceeds; the pool is
+recreated by the next map. Pool processes are also killed with their parent
+(PR_SET_PDEATHSIG), e.g. on a hard time limit.
+"""
+import atexit
+import ctypes
+import os
+import signal
+import sys
+import threading
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import billiard
+import numpy as np
+
+from app.core.config import settings
+
+PR_SET_PDEATHSIG = 1
+
+_parallelism = 1
+_pool = None
+_pool_pid = None
+# Processes of the Celery worker sharing the CPUs, set before they are forked
+_worker_concurrency = 1
+
+
+class TaskTerminated(Exception):
+    """SIGTERM received while parts were running on the pool"""
+
+
+def set_worker_concurrency(concurrency: int) -> None:
+    global _worker_concurrency
+    _worker_concurrency = max(1, concurrency or 1)
+
+
+def pool_size() -> int:
+    if settings.SCRIPT_POOL_PROCESSES:
+        return settings.SCRIPT_POOL_PROCESSES
+    return max(1, (os.cpu_count() or 1) // _worker_concurrency)
+
+
+@contextmanager
+def task_parallelism(spec):
+    """Set the parallelism of the module task running in this process"""
+    global _parallelism
+    previous = _parallelism
+    requested = settings.MODULE_MAX_PARALLELISM.get(spec.module_id, spec.max_parallelism)
+    _parallelism = max(1, min(requested, pool_size()))
+    try:
+        yield _parallelism
+    finally:
+        _parallelism = previous
+
+
+def current_parallelism() -> int:
+    return _parallelism
+
+
+def split_range(total: int, parts: int) -> List[Tuple[int, int]]:
+    """Split [0, total) into at most `parts` non-empty ranges of near-equal size"""
+    parts = max(1, min(parts, total))
+    bounds = [total * i // parts for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i + 1] > bounds[i]]
+
+
+def _init_pool_process() -> None:
+    """Tie a pool process to the task process that forked it"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL(None, use_errno=True).prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+        except (OSError, AttributeError):
+            pass
+
+
+def get_pool():
+    """Get the persistent process pool of this worker process"""
+    global _pool, _pool_pid
+    # A pool inherited through fork has no processes or handler threads here
+    if _pool is None or _pool_pid != os.getpid():
+        # Celery's prefork children are daemonic, which the standard library
+        # refuses to start processes from; billiard (Celery's multiprocessing
+        # fork) allows it. Pool processes are tied to their parent by
+        # _init_pool_process instead.
+        _pool = billiard.get_context("fork").Pool(pool_size(), initializer=_init_pool_process)
+        _pool_pid = os.getpid()
+        atexit.register(discard_pool)
+    return _pool
+
+
+def pool_pids() -> List[int]:
+    """Process ids of the pool of this worker process, if it has been started"""
+    if _pool is None or _pool_pid != os.getpid():
+        return []
+    return [process.pid for process in _pool._pool if process.pid]
+
+
+def discard_pool() -> None:
+    """Terminate the pool, including any parts still running on it"""
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.terminate()
+    _pool = None
+
+
+def _attach(specs: Dict[str, tuple]):
+    """Attach to shared arrays in a pool process"""
+    segments, arrays = [], {}
+    for name, (segment_name, shape, dtype) in specs.items():
+        # Pool processes are forked and share the task process's resource
+        # tracker, which the segment is registered with once
+        segment = shared_memory.SharedMemory(name=segment_name)
+        segments.append(segment)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+    return segments, arrays
+
+
+def _run_part(func: Callable, specs: Dict[str, tuple], start: int, stop: int, args: tuple):
+    segments, arrays = _attach(specs)
+    try:
+        return func(arrays, start, stop, *args)
+    finally:
+        del arrays
+        for segment in segments:
+            segment.close()
+
+
+def _raise_terminated(signum, frame):
+    raise TaskTerminated()
+
+
+class SharedArrays:
+    """
+    Named arrays of a chunk and a map over row ranges of them
+    Use as a context manager; arrays obtained from it are only valid inside
+    """
+    def __init__(self, inputs: Dict[str, np.ndarray], outputs: Optional[Dict[str, tuple]] = None):
+        self.parallelism = current_parallelism()
+        self._segments = []
+        self._specs = {}
+        self._arrays = {}
+        self._previous_sigterm = None
+        for name, array in inputs.items():
+            array = np.asarray(array)
+            if self.parallelism > 1:
+                self._allocate(name, array.shape, array.dtype)[...] = array
+            else:
+                self._arrays[name] = array
+        for name, (shape, dtype) in (outputs or {}).items():
+            self._allocate(name, shape, dtype)
+
+    def _allocate(self, name: str, shape, dtype) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        if self.parallelism > 1:
+            segment = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+            self._segments.append(segment)
+            self._specs[name] = (segment.name, tuple(shape), dtype.str)
+            array = np.ndarray(shape, dtype, buffer=segment.buf)
+        else:
+            array = np.empty(shape, dtype)
+        self._arrays[name] = array
+        return array
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    def map(self, func: Callable, total: int, *args) -> list:
+        """
+        Results of func(arrays, start, stop, *args) for the row ranges of
+        [0, total), in order; func must be a module-level function
+        """
+        ranges = split_range(total, self.parallelism)
+        if self.parallelism == 1 or len(ranges) < 2:
+            return [func(self._arrays, start, stop, *args) for start, stop in ranges]
+        pool = get_pool()
+        try:
+            return pool.starmap(_run_part, [(func, self._specs, start, stop, args) for start, stop in ranges], chunksize=1)
+        except BaseException:
+            discard_pool()
+            raise
+
+    def __enter__(self):
+        if self._segments and threading.current_thread() is threading.main_thread():
+            self._previous_sigterm = signal.signal(signal.SIGTERM, _raise_terminated)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._arrays.clear()
+        for segment in self._segments:
+            try:
+                segment.close()
+            except BufferError:  # a view is still referenced, the mapping goes with it
+                pass
+            segment.unlink()
+        self._segments.clear()
+        if self._previous_sigterm is not None:
+            signal.signal(signal.SIGTERM, self._previous_sigterm)
+            if exc_type is TaskTerminated:
+                # Cleaned up, now let the termination proceed as it would have
+                os.kill(os.getpid(), signal.SIGTERM)
+        return False
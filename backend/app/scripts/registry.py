@@ -0,0 +1,228 @@
+"""
+Module registry
+Single declaration of every executable module: its script, permission,
+queue, time limits, resource class and parameter schema. The execute and
+batch endpoints, the Celery router, the module catalog and the seed data are
+all driven by it, so adding a module means adding its script and one entry
+here.
+
+Scripts are referenced by import path and only imported when first run, so
+the API process never imports script code or its dependencies.
+"""
+import importlib
+import inspect
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Literal, Optional, Type
+
+from celery.exceptions import SoftTimeLimitExceeded
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+
+class ModuleParameters(BaseModel):
+    """
+    Base of the module parameter schemas
+    Undeclared parameters are passed through to the script unchanged
+    """
+    model_config = ConfigDict(extra="allow")
+
+
+class PatientAnalysisParameters(ModuleParameters):
+    """Parameters of module1"""
+    patient_count: int = Field(150, ge=0)
+    chunk_size: int = Field(50, ge=1)
+    seed: int = 0
+
+
+class ImageProcessingParameters(ModuleParameters):
+    """
+    Parameters of module2
+    With `volume_path` (relative to IMAGE_INPUT_DIR) the slices of a .npy or
+    .raw volume are processed `chunk_size` at a time, otherwise `image_count`
+    synthetic images
+    """
+    image_count: int = Field(45, ge=0)
+    chunk_size: int = Field(15, ge=1)
+    image_size: int = Field(64, ge=4, le=4096)
+    filter_size: int = Field(3, ge=1, le=31)
+    seed: int = 0
+    volume_path: Optional[str] = Field(None, max_length=1024)
+    raw_shape: Optional[List[int]] = Field(None, min_length=2, max_length=3)
+    raw_dtype: Literal["uint8", "uint16", "int16", "float32", "float64"] = "uint16"
+
+    @field_validator("filter_size")
+    @classmethod
+    def filter_size_is_odd(cls, value: int) -> int:
+        if value % 2 == 0:
+            raise ValueError("filter_size must be odd")
+        return value
+
+    @field_validator("volume_path")
+    @classmethod
+    def volume_path_is_relative(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return value
+        if os.path.isabs(value) or ".." in value.split("/"):
+            raise ValueError("volume_path must be relative to the image directory")
+        if not value.endswith((".npy", ".raw")):
+            raise ValueError("volume_path must be a .npy or .raw file")
+        return value
+
+    @model_validator(mode="after")
+    def raw_volumes_have_shape(self):
+        if self.volume_path and self.volume_path.endswith(".raw") and not self.raw_shape:
+            raise ValueError("raw_shape is required for .raw volumes")
+        return self
+
+
+class DrugInteractionParameters(ModuleParameters):
+    """
+    Parameters of module3
+    With `medications` the list is checked against the knowledge base index,
+    otherwise all pairs of `drug_count` synthetic drugs are scored
+    """
+    medications: Optional[List[str]] = Field(None, max_length=1000)
+    drug_count: int = Field(28, ge=0, le=5000)
+    seed: int = 0
+
+
+@lru_cache(maxsize=None)
+def import_script(path: str) -> Callable:
+    """Resolve a "package.module:function" script path"""
+    module_path, func_name = path.split(":")
+    return getattr(importlib.import_module(module_path), func_name)
+
+
+@dataclass(frozen=True)
+class ModuleSpec:
+    """Declaration of an executable module"""
+    module_id: str
+    name: str
+    description: str
+    # "package.module:function"
+    script: str
+    parameters: Type[ModuleParameters]
+    # Bump whenever the output for the same parameters changes; part of the
+    # result cache key
+    version: str = "1"
+    # "package.module:function" returning, for the parameters, the version of
+    # inputs read from outside them (files, knowledge base) or None; also
+    # part of the result cache key
+    input_version: str = ""
+    # Permission required to execute the module, defaults to the module id
+    permission: str = ""
+    queue: str = ""
+    # Celery soft (raises SoftTimeLimitExceeded) and hard time limits in seconds
+    soft_time_limit: Optional[int] = None
+    time_limit: Optional[int] = None
+    # Kind of resource the script is bound by: cpu, io or memory
+    resource_class: str = "cpu"
+    # Pool processes a single task may split its chunks over (app.scripts.parallel)
+    max_parallelism: int = 1
+
+    def __post_init__(self):
+        if not self.permission:
+            object.__setattr__(self, "permission", self.module_id)
+        if not self.queue:
+            object.__setattr__(self, "queue", self.module_id)
+
+    def load_script(self) -> Callable:
+        """Import the script function on first use"""
+        return import_script(self.script)
+
+    def get_input_version(self, parameters: dict) -> Optional[str]:
+        """Version of the external inputs of an execution (worker side)"""
+        return import_script(self.input_version)(parameters) if self.input_version else None
+
+    def validate_parameters(self, parameters: dict) -> dict:
+        """
+        Validate parameters and fill in defaults
+        Raises pydantic.ValidationError
+        """
+        return self.parameters.model_validate(parameters).model_dump()
+
+
+MODULES: Dict[str, ModuleSpec] = {
+    spec.module_id: spec
+    for spec in [
+        ModuleSpec(
+            module_id="module1",
+            name="Patient Data Analysis",
+            description="Analyze patient data and generate reports",
+            script="app.scripts.medical_scripts:module1_script",
+            parameters=PatientAnalysisParameters,
+            version="3",
+            soft_time_limit=600,
+            time_limit=660,
+            max_parallelism=8,
+        ),
+        ModuleSpec(
+            module_id="module2",
+            name="Medical Image Processing",
+            description="Process and analyze medical images",
+            script="app.scripts.medical_scripts:module2_script",
+            parameters=ImageProcessingParameters,
+            input_version="app.scripts.medical_scripts:module2_input_version",
+            version="4",
+            soft_time_limit=1800,
+            time_limit=1860,
+            resource_class="memory",
+            max_parallelism=8,
+        ),
+        ModuleSpec(
+            module_id="module3",
+            name="Drug Interaction Analysis",
+            description="Analyze drug interactions and provide recommendations",
+            script="app.scripts.medical_scripts:module3_script",
+            parameters=DrugInteractionParameters,
+            input_version="app.scripts.medical_scripts:module3_input_version",
+            version="3",
+            soft_time_limit=300,
+            time_limit=360,
+        ),
+    ]
+}
+
+
+def get_module(module_id: str) -> Optional[ModuleSpec]:
+    """Get a module declaration by id"""
+    return MODULES.get(module_id)
+
+
+def get_script(module_id: str) -> Optional[Callable]:
+    """Get the script function of a module"""
+    spec = MODULES.get(module_id)
+    return spec.load_script() if spec is not None else None
+
+
+def get_script_version(module_id: str) -> str:
+    """Get the script version of a module"""
+    spec = MODULES.get(module_id)
+    return spec.version if spec is not None else "0"
+
+
+def run_script(script_func: Callable, parameters: dict, on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Run a plain or generator script and return its result
+    Progress updates of generator scripts are handed to `on_progress` one at
+    a time, so memory use does not grow with the number of chunks. A soft
+    time limit hit while the script is suspended is raised at its `yield`,
+    so the script can catch it and return a partial result.
+    """
+    if not inspect.isgeneratorfunction(script_func):
+        return script_func(parameters)
+    
+    steps = script_func(parameters)
+    interrupt = None
+    while True:
+        try:
+            update = steps.throw(interrupt) if interrupt is not None else next(steps)
+        except StopIteration as stop:
+            return stop.value
+        interrupt = None
+        if on_progress is not None:
+            try:
+                on_progress(update)
+            except SoftTimeLimitExceeded as e:
+                interrupt = e
@@ -0,0 +1,145 @@
+"""
+Memory-mapped, slab-oriented volume I/O for module2
+
+Volumes (.npy, or headerless .raw with a given shape and dtype) are
+memory-mapped and read a slab of slices at a time; outputs are written
+slab by slab into a memory-mapped .npy file. Pages of a slab are released
+from the process once it has been processed, so resident memory stays at a
+few slabs whatever the volume size.
+"""
+import mmap
+import os
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def resolve_data_path(root: str, relative_path: str) -> str:
+    """Absolute path of a file below `root`; rejects paths escaping it"""
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Path outside of {root}: {relative_path}")
+    return path
+
+
+def open_volume(path: str, raw_shape: Optional[Sequence[int]] = None, raw_dtype: str = "uint16") -> np.memmap:
+    """
+    Memory-map a volume read-only as (slices, height, width)
+    2-D images are treated as a single slice
+    """
+    if path.endswith(".npy"):
+        volume = np.load(path, mmap_mode="r")
+    elif path.endswith(".raw"):
+        if not raw_shape:
+            raise ValueError("raw volumes need raw_shape")
+        volume = np.memmap(path, dtype=np.dtype(raw_dtype), mode="r", shape=tuple(raw_shape))
+    else:
+        raise ValueError(f"Unsupported volume format: {path}")
+    if volume.ndim == 2:
+        volume = volume[np.newaxis]
+    if volume.ndim != 3:
+        raise ValueError(f"Expected a 2-D image or 3-D volume, got shape {volume.shape}")
+    return volume
+
+
+def release_pages(array: np.memmap, start_byte: int, stop_byte: int) -> None:
+    """
+    Drop the pages of a byte range of a memory-mapped array from this process
+    The data stays in the file (and the page cache), so this only bounds the
+    resident set; writable maps must be flushed first
+    """
+    mm = getattr(array, "_mmap", None)
+    if mm is None or not hasattr(mm, "madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    base = array.offset % mmap.ALLOCATIONGRANULARITY
+    begin = (base + start_byte) // mmap.PAGESIZE * mmap.PAGESIZE
+    end = min(len(mm), -(-(base + stop_byte) // mmap.PAGESIZE) * mmap.PAGESIZE)
+    if end > begin:
+        mm.madvise(mmap.MADV_DONTNEED, begin, end - begin)
+
+
+def iter_slabs(volume: np.memmap, slab_size: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield (first slice, float64 copy of the slab) for consecutive slabs
+    The mapped pages of each slab are released once the next one is requested
+    """
+    slice_bytes = volume[0].nbytes if len(volume) else 0
+    for start in range(0, len(volume), slab_size):
+        stop = min(start + slab_size, len(volume))
+        yield start, np.asarray(volume[start:stop], dtype=np.float64)
+        release_pages(volume, start * slice_bytes, stop * slice_bytes)
+
+
+class SlabWriter:
+    """
+    Write a volume slab by slab into a memory-mapped .npy file
+    The file is written under a temporary name and renamed on commit(), so a
+    failed or cancelled task never leaves a partial output behind
+    """
+    def __init__(self, path: str, shape: Tuple[int, ...], dtype=np.float32):
+        self.path = path
+        self.tmp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.array = np.lib.format.open_memmap(self.tmp_path, mode="w+", dtype=dtype, shape=shape)
+        self.slice_bytes = self.array[0].nbytes if shape[0] else 0
+        self.committed = False
+
+    def write(self, start: int, slab) -> None:
+        stop = start + len(slab)
+        self.array[start:stop] = slab
+        self.array.flush()
+        release_pages(self.array, start * self.slice_bytes, stop * self.slice_bytes)
+
+    def commit(self) -> None:
+        self.array.flush()
+        # Unmapped before the rename
+        self.array = None
+        os.replace(self.tmp_path, self.path)
+        self.committed = True
+
+    def abort(self) -> None:
+        """Discard the temporary file; does nothing once committed, so cleanup paths may always call it"""
+        if self.committed:
+            return
+        self.array = None
+        try:
+            os.unlink(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def reset_peak_rss(pids: Sequence[int] = ()) -> None:
+    """Reset the peak resident set size of this process and of `pids` (Linux), best effort"""
+    for pid in ["self", *pids]:
+        try:
+            with open(f"/proc/{pid}/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            pass
+
+
+def _vm_hwm_bytes(pid) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_bytes(pids: Sequence[int] = ()) -> int:
+    """
+    Sum of the peak resident set sizes of this process and of `pids`, e.g. its
+    pool processes
+    Since the last reset_peak_rss() where supported, since process start
+    otherwise. Pages mapped by several of them, such as shared-memory slabs,
+    count once per process, so the sum is an upper bound.
+    """
+    own = _vm_hwm_bytes("self")
+    if own is None:
+        import resource
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return own + sum(_vm_hwm_bytes(pid) or 0 for pid in pids)
@@ -0,0 +1,41 @@
+"""
+Authenticated request rate benchmark
+
+Hammers GET /auth/me, the cheapest authenticated endpoint, so the cost of
+get_current_user dominates. Run it once against an API started with
+AUTH_STATELESS=false and once with the default AUTH_STATELESS=true to see
+the gain from skipping the per-request user/permission queries:
+
+    python -m benchmarks.auth_throughput --concurrency 32 --requests 5000
+"""
+import argparse
+import json
+
+from benchmarks.common import HttpClient, login, run_load
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = login(args.base_url, args.username, args.password)
+
+    def make_worker():
+        client = HttpClient(args.base_url, token)
+        return lambda: client.request("GET", "/auth/me")[0] == 200
+
+    report = {
+        "benchmark": "auth_me",
+        "concurrency": args.concurrency,
+        **run_load(make_worker, args.concurrency, args.requests),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Shared helpers for the benchmark scripts
+Only the standard library is used so the scripts run against any deployment
+"""
+import http.client
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+
+class HttpClient:
+    """Minimal keep-alive HTTP client, one per benchmark thread"""
+    def __init__(self, base_url: str, token: Optional[str] = None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.token = token
+        self._conn = None
+
+    def request(self, method: str, path: str, body=None, form: Optional[dict] = None):
+        """Send a request and return (status, decoded JSON body or None)"""
+        headers = {}
+        payload = None
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if form is not None:
+            payload = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            self._conn.request(method, self.prefix + path, body=payload, headers=headers)
+            response = self._conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self._conn.close()
+            self._conn = None
+            raise
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+def login(base_url: str, username: str, password: str) -> str:
+    """Log in and return an access token"""
+    status, data = HttpClient(base_url).request(
+        "POST", "/auth/login", form={"username": username, "password": password}
+    )
+    if status != 200:
+        raise RuntimeError(f"Login failed with HTTP {status}: {data}")
+    return data["access_token"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    """Summarize latencies (seconds) as milliseconds percentiles and throughput"""
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def run_load(
+    make_worker: Callable[[], Callable[[], bool]],
+    concurrency: int,
+    total_requests: int
+) -> Dict[str, float]:
+    """
+    Run `total_requests` operations spread over `concurrency` threads
+
+    `make_worker` is called once per thread and returns the operation to
+    repeat; the operation returns True on success.
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = [total_requests]
+
+    def worker():
+        nonlocal errors
+        operation = make_worker()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                ok = operation()
+            except Exception:
+                ok = False
+            duration = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(duration)
+                else:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return summarize(latencies, errors, time.perf_counter() - started)
@@ -0,0 +1,105 @@
+"""
+Compute backend micro-benchmarks
+
+Times each module kernel on synthetic datasets with every available
+backend, reports records/sec (patients, images or drug pairs) and checks
+that all backends return the same results as the pure-Python reference:
+
+    python -m benchmarks.engines --patients 200000 --images 200 --drugs 800
+
+Needs the backend requirements (NumPy) installed; the exit status is 1 if
+any backend disagrees with the reference.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+
+from app.scripts.engines import create_backend, results_match  # noqa: E402
+from app.scripts.engines.datasets import (  # noqa: E402
+    synthetic_cohort, synthetic_drug_profiles, synthetic_images
+)
+from app.scripts.engines.stats import (  # noqa: E402
+    BRIGHT_PIXEL_THRESHOLD, INTERACTION_THRESHOLD, VITAL_REFERENCE_RANGES
+)
+
+
+def best_time(func, repeat: int):
+    """Fastest of `repeat` runs, and the result of the last one"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def workloads(args):
+    """(name, records, prepare(backend) -> data, kernel(backend, data) -> result)"""
+    cohort = synthetic_cohort(args.patients, random.Random(1))
+    images = synthetic_images(args.images, args.image_size, random.Random(2))
+    profiles = synthetic_drug_profiles(args.drugs, random.Random(3))
+
+    def cohort_kernel(backend, columns):
+        return backend.column_moments(columns), backend.range_anomalies(columns, VITAL_REFERENCE_RANGES)
+
+    def image_kernel(backend, batch):
+        filtered = backend.box_filter(backend.normalize_images(batch), args.filter_size)
+        return backend.image_statistics(filtered, BRIGHT_PIXEL_THRESHOLD)
+
+    def interaction_kernel(backend, prepared):
+        return backend.interaction_scores(prepared, INTERACTION_THRESHOLD)
+
+    return [
+        ("module1_cohort", args.patients, lambda b: b.prepare_columns(cohort), cohort_kernel),
+        ("module2_images", args.images, lambda b: b.prepare_images(images), image_kernel),
+        ("module3_interactions", args.drugs * (args.drugs - 1) // 2,
+         lambda b: b.prepare_profiles(*profiles), interaction_kernel),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=200000)
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--image-size", type=int, default=128)
+    parser.add_argument("--filter-size", type=int, default=3)
+    parser.add_argument("--drugs", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", default="python,numpy")
+    args = parser.parse_args()
+
+    backends = [create_backend(name) for name in args.backends.split(",")]
+    report = {"benchmark": "engines", "kernels": {}}
+    mismatches = []
+    for name, records, prepare, kernel in workloads(args):
+        entry = {"records": records}
+        reference = None
+        for backend in backends:
+            data = prepare(backend)
+            seconds, result = best_time(lambda: kernel(backend, data), args.repeat)
+            entry[backend.name] = {
+                "seconds": round(seconds, 6),
+                "records_per_sec": round(records / seconds, 1) if seconds > 0 else None,
+            }
+            if reference is None:
+                reference = (backend.name, result)
+            elif not results_match(result, reference[1]):
+                mismatches.append(f"{name}: {backend.name} disagrees with {reference[0]}")
+        timings = [entry[b.name]["seconds"] for b in backends]
+        if len(backends) > 1 and timings[-1] > 0:
+            entry["speedup"] = round(timings[0] / timings[-1], 1)
+        report["kernels"][name] = entry
+
+    report["mismatches"] = mismatches
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+API load-testing harness
+
+Starts the API in-process against local stand-ins, so no PostgreSQL, Redis or
+Celery worker is needed: SQLite (aiosqlite) for the database and Celery's
+in-memory broker and result backend. Submitted tasks are queued but never
+executed, which keeps the measurement on the API itself. Features that need
+Redis (token version check, result cache) are disabled unless --redis-url is
+given.
+
+Drives login, execute, tasks/{id} and list at the configured concurrency and
+prints p50/p95/p99 latency and throughput per operation as JSON:
+
+    python -m benchmarks.harness --concurrency 16 --requests 500 --output report.json
+
+To catch regressions, compare against an earlier report; the exit status is
+1 if any operation's p95 grew by more than --max-regression:
+
+    python -m benchmarks.harness --baseline report.json --max-regression 0.2
+
+Use --base-url to run the same workload against a running deployment instead.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import HttpClient, login, run_load
+
+MODULES = ["module1", "module2", "module3"]
+
+
+def configure_local_environment(workdir: str, redis_url: str = None) -> None:
+    """Point the app settings at the local stand-ins; must run before importing app"""
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["CELERY_BROKER_URL"] = "memory://"
+    os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+    else:
+        os.environ["AUTH_TOKEN_VERSION_CHECK"] = "false"
+        os.environ["RESULT_CACHE_ENABLED"] = "false"
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_server():
+    """Create the schema, then run the API with uvicorn in a background thread, return (server, base_url)"""
+    import uvicorn
+    from app.db.init_db import init_db
+    from app.main import app
+
+    init_db()
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("Local API server failed to start")
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}/api/v1"
+
+
+def run_benchmarks(base_url: str, username: str, password: str, concurrency: int, requests: int) -> dict:
+    """Run every workload and return the per-operation summaries"""
+    results = {}
+
+    # Login is bcrypt-bound, so it gets a smaller share of the requests
+    def make_login():
+        client = HttpClient(base_url)
+        form = {"username": username, "password": password}
+        return lambda: client.request("POST", "/auth/login", form=form)[0] == 200
+    results["login"] = run_load(make_login, concurrency, max(concurrency, requests // 10))
+
+    token = login(base_url, username, password)
+    task_ids = []
+    lock = threading.Lock()
+    counter = [0]
+
+    def make_execute():
+        client = HttpClient(base_url, token)
+
+        def execute():
+            with lock:
+                counter[0] += 1
+                seq = counter[0]
+            module = MODULES[seq % len(MODULES)]
+            status, data = client.request(
+                "POST", f"/modules/{module}/execute",
+                body={"module_name": module, "parameters": {"benchmark_seq": seq}}
+            )
+            if status == 200:
+                with lock:
+                    task_ids.append(data["task_id"])
+            return status == 200
+        return execute
+    results["execute"] = run_load(make_execute, concurrency, requests)
+
+    if not task_ids:
+        raise RuntimeError("No task was submitted successfully, cannot benchmark status reads")
+
+    def make_status():
+        client = HttpClient(base_url, token)
+        position = [0]
+
+        def status():
+            task_id = task_ids[position[0] % len(task_ids)]
+            position[0] += 1
+            return client.request("GET", f"/modules/tasks/{task_id}")[0] == 200
+        return status
+    results["task_status"] = run_load(make_status, concurrency, requests)
+
+    def make_list():
+        client = HttpClient(base_url, token)
+        return lambda: client.request("GET", "/modules/tasks?limit=20")[0] == 200
+    results["task_list"] = run_load(make_list, concurrency, requests)
+
+    return results
+
+
+def find_regressions(report: dict, baseline: dict, max_regression: float) -> list:
+    """Operations whose p95 latency grew by more than max_regression (a fraction)"""
+    regressions = []
+    for operation, current in report["operations"].items():
+        previous = baseline.get("operations", {}).get(operation)
+        if not previous or not previous.get("p95_ms"):
+            continue
+        growth = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"]
+        if growth > max_regression:
+            regressions.append({
+                "operation": operation,
+                "baseline_p95_ms": previous["p95_ms"],
+                "p95_ms": current["p95_ms"],
+                "growth": round(growth, 3),
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="benchmark a running deployment instead of a local instance")
+    parser.add_argument("--redis-url", help="use this Redis with the local instance and enable Redis features")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests per operation")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix="zeus-bench-") as workdir:
+        base_url = args.base_url
+        if base_url is None:
+            configure_local_environment(workdir, args.redis_url)
+            server, base_url = start_local_server()
+        try:
+            operations = run_benchmarks(base_url, args.username, args.password, args.concurrency, args.requests)
+        finally:
+            if server is not None:
+                server.should_exit = True
+
+    report = {
+        "target": args.base_url or "local",
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "operations": operations,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = find_regressions(report, json.load(f), args.max_regression)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Login concurrency scaling benchmark
+
+Runs POST /auth/login at increasing concurrency and reports throughput at
+each level. With bcrypt verified in the PASSWORD_HASH_WORKERS pool, login
+throughput should grow with concurrency up to the number of CPU cores, then
+level off; when bcrypt blocked the event loop it stayed flat at a few logins
+per second whatever the concurrency.
+
+Keep LOGIN_VERIFY_CACHE_SECONDS at 0 on the target, otherwise repeated
+logins are served from the verified-credential cache and bcrypt is not
+measured. Without --base-url the API is started locally as in
+benchmarks.harness:
+
+    python -m benchmarks.login_concurrency --levels 1,2,4,8,16
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.common import HttpClient, run_load
+from benchmarks.harness import configure_local_environment, start_local_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="benchmark a running deployment instead of a local instance")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests-per-worker", type=int, default=8)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix="zeus-bench-") as workdir:
+        base_url = args.base_url
+        if base_url is None:
+            configure_local_environment(workdir)
+            os.environ["LOGIN_VERIFY_CACHE_SECONDS"] = "0"
+            server, base_url = start_local_server()
+
+        def make_worker():
+            client = HttpClient(base_url)
+            form = {"username": args.username, "password": args.password}
+            return lambda: client.request("POST", "/auth/login", form=form)[0] == 200
+
+        results = []
+        try:
+            for concurrency in levels:
+                summary = run_load(make_worker, concurrency, concurrency * args.requests_per_worker)
+                results.append({"concurrency": concurrency, **summary})
+        finally:
+            if server is not None:
+                server.should_exit = True
+
+    single = results[0]["throughput_rps"] if results else 0
+    for entry in results:
+        entry["speedup"] = round(entry["throughput_rps"] / single, 2) if single else None
+    print(json.dumps({
+        "benchmark": "login_concurrency",
+        "target": args.base_url or "local",
+        "cpu_count": os.cpu_count(),
+        "levels": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Queue latency under mixed load
+
+Floods the stack with slow module2 image jobs while submitting quick
+module1/module3 analyses, and reports end-to-end latency (submission until a
+terminal status is observed) per module. With per-module queues and
+dedicated workers, the quick modules' tail latency should stay close to
+their script runtime instead of growing with the module2 backlog:
+
+    python -m benchmarks.queue_latency --slow-jobs 40 --quick-jobs 40
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import HttpClient, login, percentile
+
+TERMINAL_STATUSES = {"success", "failed"}
+
+
+def run_job(base_url: str, token: str, module: str, seq: int, priority, poll_interval: float):
+    """Submit one job and wait for it to finish, returning (module, latency, ok)"""
+    client = HttpClient(base_url, token)
+    body = {
+        "module_name": module,
+        # Unique parameters so the result cache cannot short-circuit the job
+        "parameters": {"benchmark_seq": seq, "benchmark_started": time.time()},
+    }
+    if priority is not None:
+        body["priority"] = priority
+    started = time.perf_counter()
+    status, data = client.request("POST", f"/modules/{module}/execute", body=body)
+    if status != 200:
+        return module, time.perf_counter() - started, False
+    task_id = data["task_id"]
+    while True:
+        status, data = client.request("GET", f"/modules/tasks/{task_id}")
+        if status == 200 and data["status"] in TERMINAL_STATUSES:
+            return module, time.perf_counter() - started, data["status"] == "success"
+        time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--slow-jobs", type=int, default=20, help="module2 jobs submitted first")
+    parser.add_argument("--quick-jobs", type=int, default=20, help="module1/module3 jobs submitted after")
+    parser.add_argument("--quick-priority", type=int, default=None, help="priority for quick jobs (0 = most urgent)")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    token = login(args.base_url, args.username, args.password)
+    jobs = [("module2", i, None) for i in range(args.slow_jobs)]
+    jobs += [("module1" if i % 2 == 0 else "module3", args.slow_jobs + i, args.quick_priority)
+             for i in range(args.quick_jobs)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(
+            lambda job: run_job(args.base_url, token, job[0], job[1], job[2], args.poll_interval),
+            jobs
+        ))
+    elapsed = time.perf_counter() - started
+
+    report = {"benchmark": "queue_latency", "elapsed_s": round(elapsed, 2), "modules": {}}
+    for module in sorted({module for module, _, _ in results}):
+        latencies = [latency for m, latency, ok in results if m == module and ok]
+        report["modules"][module] = {
+            "jobs": sum(1 for m, _, _ in results if m == module),
+            "failed": sum(1 for m, _, ok in results if m == module and not ok),
+            "p50_s": round(percentile(latencies, 50), 2),
+            "p95_s": round(percentile(latencies, 95), 2),
+            "p99_s": round(percentile(latencies, 99), 2),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ const API_BASE_URL = 'http://localhost:8000/api/v1';
 // State management
 let authToken = null;
 let currentUser = null;
-let taskPollingIntervals = {};
+let taskStreams = {};
 
 // DOM Elements
 const loginPage = document.getElementById('login-page');
@@ -92,11 +92,11 @@ function handleLogout() {
     currentUser = null;
     localStorage.removeItem('authToken');
     
-    // Clear all polling intervals
-    Object.keys(taskPollingIntervals).forEach(key => {
-        clearInterval(taskPollingIntervals[key]);
+    // Close all task status streams
+    Object.keys(taskStreams).forEach(key => {
+        taskStreams[key].close();
     });
-    taskPollingIntervals = {};
+    taskStreams = {};
     
     showLoginPage();
 }
@@ -219,77 +219,127 @@ async function executeModule(module) {
             </div>
         `;
         
-        // Start polling for task status
-        pollTaskStatus(module, taskId);
+        // Subscribe to task status updates
+        streamTaskStatus(module, taskId);
     } catch (error) {
         infoDiv.innerHTML = `<div class="status failed">错误: ${error.message}</div>`;
         button.disabled = false;
     }
 }
 
-function pollTaskStatus(module, taskId) {
-    // Clear existing interval for this module
-    if (taskPollingIntervals[module]) {
-        clearInterval(taskPollingIntervals[module]);
+async function cancelTask(taskId) {
+    // The stream receives the "cancelled" status once the task is revoked
+    try {
+        const response = await fetch(`${API_BASE_URL}/modules/tasks/${taskId}`, {
+            method: 'DELETE',
+            headers: {
+                'Authorization': `Bearer ${authToken}`
+            }
+        });
+        
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || '取消失败');
+        }
+    } catch (error) {
+        alert(`取消失败: ${error.message}`);
+    }
+}
+
+function streamTaskStatus(module, taskId) {
+    // Close existing stream for this module
+    if (taskStreams[module]) {
+        taskStreams[module].close();
     }
     
     const infoDiv = document.getElementById(`${module}-info`);
     const button = document.querySelector(`[data-module="${module}"]`);
     
-    taskPollingIntervals[module] = setInterval(async () => {
-        try {
-            const response = await fetch(`${API_BASE_URL}/modules/tasks/${taskId}`, {
-                headers: {
-                    'Authorization': `Bearer ${authToken}`
-                }
-            });
-            
-            if (!response.ok) {
-                throw new Error('获取任务状态失败');
-            }
-            
-            const taskStatus = await response.json();
-            
-            if (taskStatus.status === 'success') {
-                clearInterval(taskPollingIntervals[module]);
-                infoDiv.innerHTML = `
-                    <h3>任务完成</h3>
-                    <div class="status success">
-                        任务ID: ${taskId}<br>
-                        状态: 成功完成
-                    </div>
-                    <div class="result">
-                        <strong>执行结果:</strong>
-                        <pre>${JSON.stringify(taskStatus.result, null, 2)}</pre>
-                    </div>
-                `;
-                button.disabled = false;
-            } else if (taskStatus.status === 'failed') {
-                clearInterval(taskPollingIntervals[module]);
-                infoDiv.innerHTML = `
-                    <h3>任务失败</h3>
-                    <div class="status failed">
-                        任务ID: ${taskId}<br>
-                        状态: 失败<br>
-                        错误: ${taskStatus.error}
-                    </div>
-                `;
-                button.disabled = false;
-            } else {
-                // Still running
-                infoDiv.innerHTML = `
-                    <h3>任务信息</h3>
-                    <div class="status pending">
-                        <span class="loading"></span>
-                        任务ID: ${taskId}<br>
-                        状态: ${taskStatus.status}
-                    </div>
-                `;
-            }
-        } catch (error) {
-            clearInterval(taskPollingIntervals[module]);
-            infoDiv.innerHTML += `<div class="status failed">轮询错误: ${error.message}</div>`;
-            button.disabled = false;
+    // EventSource cannot send headers, so the token goes in the query string
+    const url = `${API_BASE_URL}/modules/tasks/${taskId}/stream?token=${encodeURIComponent(authToken)}`;
+    const stream = new EventSource(url);
+    taskStreams[module] = stream;
+    
+    const closeStream = () => {
+        stream.close();
+        if (taskStreams[module] === stream) {
+            delete taskStreams[module];
+        }
+        button.disabled = false;
+    };
+    
+    stream.addEventListener('status', (event) => {
+        const taskStatus = JSON.parse(event.data);
+        
+        if (taskStatus.status === 'success') {
+            closeStream();
+            infoDiv.innerHTML = `
+                <h3>任务完成</h3>
+                <div class="status success">
+                    任务ID: ${taskId}<br>
+                    状态: 成功完成
+                </div>
+                <div class="result">
+                    <strong>执行结果:</strong>
+                    <pre>${JSON.stringify(taskStatus.result, null, 2)}</pre>
+                </div>
+            `;
+        } else if (taskStatus.status === 'failed') {
+            closeStream();
+            infoDiv.innerHTML = `
+                <h3>任务失败</h3>
+                <div class="status failed">
+                    任务ID: ${taskId}<br>
+                    状态: 失败<br>
+                    错误: ${taskStatus.error}
+                </div>
+            `;
+        } else if (taskStatus.status === 'cancelled' || taskStatus.status === 'expired') {
+            closeStream();
+            const label = taskStatus.status === 'cancelled' ? '已取消' : '已超时';
+            // A task stopped by its soft time limit may return a partial result
+            const partial = taskStatus.result
+                ? `<div class="result">
+                       <strong>部分结果:</strong>
+                       <pre>${JSON.stringify(taskStatus.result, null, 2)}</pre>
+                   </div>`
+                : '';
+            infoDiv.innerHTML = `
+                <h3>任务${label}</h3>
+                <div class="status cancelled">
+                    任务ID: ${taskId}<br>
+                    状态: ${label}
+                </div>
+                ${partial}
+            `;
+        } else {
+            // Still running
+            const progress = taskStatus.progress
+                ? `<br>进度: ${taskStatus.progress.processed} / ${taskStatus.progress.total}`
+                : '';
+            infoDiv.innerHTML = `
+                <h3>任务信息</h3>
+                <div class="status pending">
+                    <span class="loading"></span>
+                    任务ID: ${taskId}<br>
+                    状态: ${taskStatus.status}${progress}
+                </div>
+                <button class="btn-secondary cancel-btn">取消任务</button>
+            `;
+            infoDiv.querySelector('.cancel-btn').addEventListener('click', () => cancelTask(taskId));
+        }
+    });
+    
+    stream.addEventListener('timeout', () => {
+        // Server closed a long-running stream, reconnect for a fresh one
+        streamTaskStatus(module, taskId);
+    });
+    
+    stream.onerror = () => {
+        // EventSource reconnects on its own unless the server refused the stream
+        if (stream.readyState === EventSource.CLOSED) {
+            closeStream();
+            infoDiv.innerHTML += `<div class="status failed">状态订阅错误: 连接已关闭</div>`;
         }
-    }, 2000); // Poll every 2 seconds
+    };
 }